@@ -0,0 +1,152 @@
+import argparse
+import multiprocessing
+import random
+import sys
+
+from time import perf_counter
+
+import numpy as np
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+SIZES = ["8x8", "16x16", "16x30"]
+DENSITIES = [0.125, 0.15625, 0.20625]
+GAMES = 100
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Play seeded Minesweeper games headlessly and report how the AI does."
+    )
+    parser.add_argument("-n", "--games", type=int, default=GAMES,
+                        help="games per board size and density")
+    parser.add_argument("--sizes", nargs="+", default=SIZES,
+                        help="board sizes as HEIGHTxWIDTH")
+    parser.add_argument("--densities", nargs="+", type=float, default=DENSITIES,
+                        help="share of cells holding a mine")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="base seed; the same seed replays the same games")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    configs = []
+    for size in args.sizes:
+        try:
+            height, width = (int(n) for n in size.lower().split("x"))
+        except ValueError:
+            sys.exit(f"Invalid board size: {size}")
+        for density in args.densities:
+            mines = max(1, round(height * width * density))
+            if mines >= height * width:
+                sys.exit(f"Too many mines for a {size} board: {mines}")
+            configs.append((height, width, mines))
+
+    results = benchmark(configs, args.games, args.seed, args.processes)
+
+    print(f"{'board':>8} {'mines':>6} {'win rate':>9} {'moves/s':>9} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'kb mean':>8} {'kb max':>7}")
+    for (height, width, mines), games in results.items():
+        report = summarize(games)
+        print(f"{f'{height}x{width}':>8} {mines:>6} {report['win_rate']:>9.3f} "
+              f"{report['moves_per_second']:>9.0f} {report['p50'] * 1000:>8.3f} "
+              f"{report['p90'] * 1000:>8.3f} {report['p99'] * 1000:>8.3f} "
+              f"{report['knowledge_mean']:>8.1f} {report['knowledge_max']:>7}")
+
+
+def benchmark(configs, games, seed=0, processes=None):
+    """
+    Play `games` games for each `(height, width, mines)` in `configs`
+    on a pool of `processes` workers.
+
+    Return a dictionary mapping each configuration to the list of its
+    game results, in game order, as returned by `play`.
+    """
+    tasks = [
+        (height, width, mines, game_seed(seed, height, width, mines, game))
+        for height, width, mines in configs
+        for game in range(games)
+    ]
+
+    with multiprocessing.Pool(processes) as pool:
+        played = pool.starmap(play, tasks, chunksize=max(1, len(tasks) // 64))
+
+    results = {config: [] for config in configs}
+    for (height, width, mines, _), result in zip(tasks, played):
+        results[(height, width, mines)].append(result)
+    return results
+
+
+def game_seed(seed, height, width, mines, game):
+    """
+    Return the seed of one game, derived only from the base seed and the
+    game's position, so results do not depend on how work is scheduled.
+    """
+    sequence = np.random.SeedSequence([seed, height, width, mines, game])
+    return int(sequence.generate_state(1, dtype=np.uint64)[0])
+
+
+def play(height, width, mines, seed):
+    """
+    Play a single game with the AI choosing every move.
+
+    Return a dictionary with whether the game was won, the number of
+    moves made, the time taken by each move, and the size of the AI's
+    knowledge base after each move.
+    """
+    # The AI breaks ties between guesses with `random`
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+
+    latencies = []
+    knowledge = []
+    won = False
+    safe_cells = height * width - mines
+
+    while True:
+        start = perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None or game.is_mine(move):
+            break
+        ai.add_knowledge_many(game.reveal(move))
+        latencies.append(perf_counter() - start)
+        knowledge.append(len(ai.knowledge))
+
+        if len(ai.moves_made) == safe_cells:
+            won = True
+            break
+
+    return {
+        "won": won,
+        "moves": len(latencies),
+        "latencies": latencies,
+        "knowledge": knowledge
+    }
+
+
+def summarize(games):
+    """
+    Return the win rate, throughput, per-move latency percentiles (in
+    seconds) and knowledge base sizes over a list of game results.
+    """
+    latencies = np.array([t for game in games for t in game["latencies"]])
+    knowledge = [size for game in games for size in game["knowledge"]]
+    percentiles = np.percentile(latencies, [50, 90, 99]) if len(latencies) else [0, 0, 0]
+
+    return {
+        "win_rate": sum(game["won"] for game in games) / len(games),
+        "moves_per_second": len(latencies) / latencies.sum() if len(latencies) else 0,
+        "p50": percentiles[0],
+        "p90": percentiles[1],
+        "p99": percentiles[2],
+        "knowledge_mean": sum(knowledge) / len(knowledge) if knowledge else 0,
+        "knowledge_max": max(knowledge, default=0)
+    }
+
+
+if __name__ == "__main__":
+    main()
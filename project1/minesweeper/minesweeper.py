@@ -1,6 +1,11 @@
+import collections
+import functools
 import itertools
+import math
 import random
 
+import numpy as np
+
 # This has been inspired by an anonymous online contributor
 
 
@@ -9,31 +14,37 @@ class Minesweeper():
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None):
 
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
-
-        # At first, player has found no mines
+        # Draw the mine positions from a single permutation of the board;
+        # without a seed, one is taken from `random` so seeding it still works
+        if seed is None:
+            seed = random.getrandbits(64)
+        rng = np.random.default_rng(seed)
+        positions = rng.permutation(height * width)[:mines]
+
+        # Boolean field with True where there is a mine
+        self.board = np.zeros(height * width, dtype=bool)
+        self.board[positions] = True
+        self.board = self.board.reshape(height, width)
+        self.mines = set((int(i), int(j)) for i, j in zip(*divmod(positions, width)))
+
+        # Precompute every cell's count of nearby mines by summing the
+        # 3x3 window around it (a convolution), minus the cell itself
+        padded = np.pad(self.board.astype(np.uint8), 1)
+        self.counts = sum(
+            padded[di:di + height, dj:dj + width]
+            for di in range(3)
+            for dj in range(3)
+        ) - self.board
+
+        # At first, player has found no mines and revealed no cells
         self.mines_found = set()
+        self.revealed = set()
 
     def print(self):
         """
@@ -51,8 +62,7 @@ class Minesweeper():
         print("--" * self.width + "-")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return bool(self.board[cell])
 
     def nearby_mines(self, cell):
         """
@@ -60,24 +70,34 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        return int(self.counts[cell])
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+    def reveal(self, cell):
+        """
+        Reveals a safe cell, flooding outwards through every connected
+        cell with no nearby mines, as clicking one would on a real board.
+        Returns a list of `(cell, count)` pairs for the newly revealed cells.
+        """
+        revealed = []
+        if cell in self.revealed:
+            return revealed
+        self.revealed.add(cell)
+        queue = collections.deque([cell])
+        neighbors = neighbor_table(self.height, self.width)
+
+        while queue:
+            cell = queue.popleft()
+            count = self.nearby_mines(cell)
+            revealed.append((cell, count))
+
+            # Neighbors of a cell with no nearby mines are all safe
+            if count == 0:
+                for neighbor in neighbors[cell[0]][cell[1]]:
+                    if neighbor not in self.revealed:
+                        self.revealed.add(neighbor)
+                        queue.append(neighbor)
+
+        return revealed
 
     def won(self):
         """
@@ -108,14 +128,16 @@ class Sentence():
         Returns the set of all cells in self.cells known to be mines.
         """
         if len(self.cells) == self.count:
-            return self.cells
+            return set(self.cells)
+        return set()
 
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
         """
         if self.count == 0:
-            return self.cells
+            return set(self.cells)
+        return set()
 
     def mark_mine(self, cell):
         """
@@ -137,17 +159,83 @@ class Sentence():
             self.cells.remove(cell)
 
 
+class CompactSentence():
+    """
+    Immutable form of a Sentence used by the AI's knowledge base.
+    Cells are stored as a bitmask over board indices (bit `i * width + j`
+    for cell `(i, j)`), so subset tests, differences and intersections
+    are single integer operations.
+    """
+
+    __slots__ = ("mask", "count", "hash")
+
+    def __init__(self, mask, count):
+        self.mask = mask
+        self.count = count
+        self.hash = hash((mask, count))
+
+    def __eq__(self, other):
+        return self.mask == other.mask and self.count == other.count
+
+    def __hash__(self):
+        return self.hash
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __str__(self):
+        return f"{list(self.bits())} = {self.count}"
+
+    def bits(self):
+        """
+        Yields the board index of every cell in the sentence, in ascending order.
+        """
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def known_mines(self):
+        """
+        Returns the mask of all cells known to be mines.
+        """
+        return self.mask if len(self) == self.count else 0
+
+    def known_safes(self):
+        """
+        Returns the mask of all cells known to be safe.
+        """
+        return self.mask if self.count == 0 else 0
+
+    def issubset(self, other):
+        return self.mask & ~other.mask == 0
+
+    def difference(self, other):
+        """
+        Returns the sentence over the cells of self not in `other`,
+        assuming `other` is a subset of self.
+        """
+        return CompactSentence(self.mask & ~other.mask, self.count - other.count)
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    # Assumed share of mines when the total number is not given
+    DENSITY = 8 / 64
+
+    def __init__(self, height=8, width=8, mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -155,8 +243,21 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # The same cells as bitmasks over board indices
+        self.mine_mask = 0
+        self.safe_mask = 0
+
+        # Set of sentences about the game known to be true
+        self.knowledge = set()
+
+        # Inverted index from each cell's board index to the sentences mentioning it
+        self.index = dict()
+
+        # Sentences added or changed since the last inference pass
+        self.dirty = []
+
+        # Mine counts of frontier components, keyed by their sentences
+        self.component_cache = dict()
 
     def mark_mine(self, cell):
         """
@@ -164,8 +265,13 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        bit = self.bit(cell)
+        self.mine_mask |= 1 << bit
+
+        # Only the sentences mentioning the cell need to change
+        for sentence in self.index.pop(bit, set()).copy():
+            self.remove_sentence(sentence)
+            self.add_sentence(CompactSentence(sentence.mask & ~(1 << bit), sentence.count - 1))
 
     def mark_safe(self, cell):
         """
@@ -173,8 +279,99 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        bit = self.bit(cell)
+        self.safe_mask |= 1 << bit
+
+        # Only the sentences mentioning the cell need to change
+        for sentence in self.index.pop(bit, set()).copy():
+            self.remove_sentence(sentence)
+            self.add_sentence(CompactSentence(sentence.mask & ~(1 << bit), sentence.count))
+
+    def bit(self, cell):
+        """
+        Returns the board index of a cell, its bit in sentence masks.
+        """
+        return cell[0] * self.width + cell[1]
+
+    def cell(self, bit):
+        """
+        Returns the cell at a board index.
+        """
+        return divmod(bit, self.width)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base, unless it is empty or already
+        known, and queues it for the next inference pass.
+        """
+        # Strip cells whose status is already known
+        mines = sentence.mask & self.mine_mask
+        if mines or sentence.mask & self.safe_mask:
+            sentence = CompactSentence(
+                sentence.mask & ~self.mine_mask & ~self.safe_mask,
+                sentence.count - mines.bit_count()
+            )
+
+        # Equal sentences hash equally, so duplicates are dropped here
+        if not sentence.mask or sentence in self.knowledge:
+            return
+
+        self.knowledge.add(sentence)
+        for bit in sentence.bits():
+            self.index.setdefault(bit, set()).add(sentence)
+        self.dirty.append(sentence)
+
+    def remove_sentence(self, sentence):
+        """
+        Removes a sentence from the knowledge base and the cell index.
+        """
+        self.knowledge.discard(sentence)
+        for bit in sentence.bits():
+            sentences = self.index.get(bit)
+            if sentences is not None:
+                sentences.discard(sentence)
+                if not sentences:
+                    del self.index[bit]
+
+    def infer(self):
+        """
+        Draws conclusions from the queued sentences until nothing new
+        can be learned. Only sentences sharing a cell with a queued one
+        are revisited, so the work done is local to what changed.
+        """
+        while self.dirty:
+            sentence = self.dirty.pop()
+
+            # Skip sentences that were replaced after being queued
+            if sentence not in self.knowledge:
+                continue
+
+            # Mark any cells whose status the sentence determines
+            if sentence.known_safes():
+                for bit in sentence.bits():
+                    self.mark_safe(self.cell(bit))
+                continue
+            if sentence.known_mines():
+                for bit in sentence.bits():
+                    self.mark_mine(self.cell(bit))
+                continue
+
+            # Collect the sentences overlapping this one
+            overlapping = set()
+            for bit in sentence.bits():
+                overlapping |= self.index.get(bit, set())
+            overlapping.discard(sentence)
+
+            # Subset inference only applies to overlapping sentences
+            for other in overlapping:
+                if sentence not in self.knowledge:
+                    break
+                if other not in self.knowledge:
+                    continue
+                if other.issubset(sentence):
+                    self.add_sentence(sentence.difference(other))
+                elif sentence.issubset(other):
+                    self.add_sentence(other.difference(sentence))
 
     def add_knowledge(self, cell, count):
         """
@@ -191,78 +388,35 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        # 1)
-        self.moves_made.add(cell)
-
-        # 2)
-        if cell not in self.safes:
-            self.mark_safe(cell)
-
-        # 3)
-        # Get adjacent cells and keep only the unique ones
-        cells = self.adjacent_cells(cell)
-        cells = cells - self.safes - self.moves_made
-
-        new_sent = Sentence(cells, count)
-
-        self.knowledge.append(new_sent)
-
-        prev_sent = new_sent
-        new_s, new_m = set(), set()
-
-        # This checks through all the knowledge
-        for sent in self.knowledge:
-            # If no unknown status cells are left in each sentence, rmv the sent
-            if len(sent.cells) == 0:
-                self.knowledge.remove(sent)
-            else:
-                # 4)  Update the known_safes and known_mines counters
-                tmp_new_s = sent.known_safes()
-                tmp_new_m = sent.known_mines()
-
-                # If no type check is made, it won't work, bc "|=" (updates set) works only in sets
-                if type(tmp_new_s) is set:
-                    new_s |= tmp_new_s
-
-                if type(tmp_new_m) is set:
-                    new_m |= tmp_new_m
-
-        for s in new_s:
-            self.mark_safe(s)
-        for m in new_m:
-            self.mark_mine(m)
-
-        new_inferences = []
-
-        for sentence in self.knowledge:
-            if len(sentence.cells) == 0:
-                self.knowledge.remove(sentence)
+        self.add_knowledge_many([(cell, count)])
 
-            elif prev_sent == new_sent:
-                break
-            elif prev_sent.cells <= new_sent.cells:
-                inf_cells = new_sent.cells - prev_sent.cells
-                inf_count = new_sent.count - prev_sent.count
+    def add_knowledge_many(self, cells_and_counts):
+        """
+        Same as `add_knowledge`, for many `(cell, count)` pairs at once,
+        such as a region revealed by a single click. All cells are marked
+        and their sentences added before a single inference pass is run.
+        """
+        cells_and_counts = list(cells_and_counts)
 
-                # 5)
-                new_inferences.append(Sentence(inf_cells, inf_count))
+        # 1) and 2)
+        for cell, _ in cells_and_counts:
+            self.moves_made.add(cell)
+            if cell not in self.safes:
+                self.mark_safe(cell)
 
-            prev_sent = new_sent
+        # 3) Known mines and safes are stripped by add_sentence
+        masks = neighbor_masks(self.height, self.width)
+        for cell, count in cells_and_counts:
+            self.add_sentence(CompactSentence(masks[self.bit(cell)], count))
 
-        self.knowledge += new_inferences
+        # 4) and 5)
+        self.infer()
 
     def adjacent_cells(self, cell):
         """
         This is a helper function that returns the each time adjacent to the given cell cells in a set.
         """
-        cells = set()
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                if (i, j) == cell:
-                    continue
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    cells.add((i, j))
-        return cells
+        return neighbor_table(self.height, self.width)[cell[0]][cell[1]]
 
     def make_safe_move(self):
         """
@@ -286,29 +440,261 @@ class MinesweeperAI():
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        Rather than choosing uniformly, the cell with the lowest
+        probability of being a mine is returned, ties broken at random.
         """
-        # Helper function that chooses and returns a random cell
-        def get_random_cell():
-            return (random.randrange(self.height),
-                    random.randrange(self.height))
+        candidates = [
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if (i, j) not in self.moves_made and (i, j) not in self.mines
+        ]
 
         # If this is true, no more (random) moves are possible
-        if len(self.moves_made) == 56:  # 56 = 8x7
+        if not candidates:
             return None
 
-        # This is the 1st quasi-recursive call
-        random_move = get_random_cell()
+        probabilities = self.mine_probabilities(candidates)
+        lowest = min(probabilities.values())
+        return random.choice([cell for cell in candidates if probabilities[cell] == lowest])
 
-        # Set of not safe moves
-        not_safe_moves = self.moves_made | self.mines
+    def mine_probabilities(self, candidates):
+        """
+        Returns a dict mapping each of the `candidates` cells to the
+        probability that it holds a mine, given the current knowledge.
 
-        # Choose a random cell over and over again, until it is not in the above set
-        while random_move in not_safe_moves:
+        The frontier (cells mentioned by some sentence) is split into
+        connected components which are counted independently, then
+        combined weighting each total number of frontier mines by the
+        number of ways to place the remaining mines on the other cells.
+        """
+        # Group sentences into components of sentences sharing cells
+        components = []
+        seen = set()
+        for sentence in self.knowledge:
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            component, stack = [], [sentence]
+            while stack:
+                current = stack.pop()
+                component.append(current)
+                for bit in current.bits():
+                    for other in self.index[bit]:
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append(other)
+            components.append(self.count_component(component))
+
+        outside = [
+            cell for cell in candidates
+            if self.bit(cell) not in self.index and cell not in self.safes
+        ]
+        unknown = len(outside)
+
+        density = self.DENSITY
+        ratio = density / (1 - density)
+
+        # Weight of configurations placing `k` mines on the frontier
+        remaining = None
+        if self.total_mines is not None:
+            remaining = self.total_mines - len(self.mines)
+
+        def weight(k):
+            if remaining is None:
+                return ratio ** k
+            left = remaining - k
+            if 0 <= left <= unknown:
+                return math.comb(unknown, left)
+            return 0
+
+        def outside_weight(k):
+            if remaining is None:
+                return ratio ** k * density
+            left = remaining - k
+            if 1 <= left <= unknown:
+                return math.comb(unknown - 1, left - 1)
+            return 0
+
+        # Convolutions of the frontier mine counts of all other components
+        prefix = [[1]]
+        for _, ways, _ in components:
+            prefix.append(convolve(prefix[-1], ways))
+        suffix = [[1]]
+        for _, ways, _ in reversed(components):
+            suffix.append(convolve(suffix[-1], ways))
+        suffix.reverse()
+
+        total = sum(ways * weight(k) for k, ways in enumerate(prefix[-1]))
+        if total == 0:
+            # Known mine count is inconsistent with what is left; fall back to the density prior
+            remaining = None
+            total = sum(ways * weight(k) for k, ways in enumerate(prefix[-1]))
+
+        probabilities = {cell: 0 for cell in candidates if cell in self.safes}
+        for n, (cells, _, mine_ways) in enumerate(components):
+            others = convolve(prefix[n], suffix[n + 1])
+            # Weight of the other components jointly with k mines here
+            combined = [
+                sum(ways * weight(k + j) for j, ways in enumerate(others))
+                for k in range(len(mine_ways[0]))
+            ]
+            for cell, by_count in zip(cells, mine_ways):
+                probabilities[cell] = sum(w * c for w, c in zip(by_count, combined)) / total
+
+        if outside:
+            p = sum(ways * outside_weight(k) for k, ways in enumerate(prefix[-1])) / total
+            for cell in outside:
+                probabilities[cell] = p
+
+        return probabilities
+
+    def count_component(self, sentences):
+        """
+        Counts the mine configurations of a connected group of sentences.
+
+        Returns a tuple `(cells, ways, mine_ways)`, where `ways[k]` is the
+        number of consistent configurations with `k` mines and
+        `mine_ways[n][k]` how many of those have a mine on `cells[n]`.
+        Results are cached, as components rarely change between guesses.
+        """
+        key = frozenset(sentences)
+        if key in self.component_cache:
+            return self.component_cache[key]
+
+        # Order cells breadth first so few sentences are open at a time
+        start = min(next(sentence.bits()) for sentence in sentences)
+        queue = collections.deque([start])
+        cells, position = [], {start: 0}
+        while queue:
+            bit = queue.popleft()
+            cells.append(bit)
+            for sentence in self.index[bit]:
+                if sentence not in key:
+                    continue
+                for other in sentence.bits():
+                    if other not in position:
+                        position[other] = len(position)
+                        queue.append(other)
+
+        # For each cell, the sentences it takes part in and how many of
+        # their cells come after it
+        constraints = list(sentences)
+        members = [[] for _ in cells]
+        for c, sentence in enumerate(constraints):
+            order = sorted(position[bit] for bit in sentence.bits())
+            for left, n in enumerate(reversed(order)):
+                members[n].append((c, left))
+
+        def step(state, n, value):
+            state = list(state)
+            for c, left in members[n]:
+                r = state[c] - value
+                if r < 0 or r > left:
+                    return None
+                state[c] = r
+            return tuple(state)
+
+        # Forward pass: ways to reach each state by mines placed so far
+        layers = [{tuple(sentence.count for sentence in constraints): [1]}]
+        for n in range(len(cells)):
+            layer = dict()
+            for state, ways in layers[-1].items():
+                for value in (0, 1):
+                    new = step(state, n, value)
+                    if new is not None:
+                        layer[new] = add(layer.get(new, []), shift(ways, value))
+            layers.append(layer)
+
+        # Backward pass: ways to complete each state by further mines
+        after = [None] * len(cells) + [{state: [1] for state in layers[-1]}]
+        for n in reversed(range(len(cells))):
+            after[n] = dict()
+            for state in layers[n]:
+                ways = []
+                for value in (0, 1):
+                    new = step(state, n, value)
+                    if new in after[n + 1]:
+                        ways = add(ways, shift(after[n + 1][new], value))
+                after[n][state] = ways
+
+        ways = after[0][next(iter(layers[0]))]
+        mine_ways = []
+        for n in range(len(cells)):
+            by_count = []
+            for state, before in layers[n].items():
+                new = step(state, n, 1)
+                if new in after[n + 1]:
+                    by_count = add(by_count, convolve(before, shift(after[n + 1][new], 1)))
+            mine_ways.append(by_count + [0] * (len(ways) - len(by_count)))
+
+        cells = [self.cell(bit) for bit in cells]
+        if len(self.component_cache) > 1000:
+            self.component_cache.clear()
+        self.component_cache[key] = (cells, ways, mine_ways)
+        return cells, ways, mine_ways
+
+
+@functools.lru_cache(maxsize=None)
+def neighbor_table(height, width):
+    """
+    Returns, for a board of the given size, a table indexed by row and
+    column of the frozenset of cells adjacent to each cell.
+    """
+    return tuple(
+        tuple(
+            frozenset(
+                (i, j)
+                for i in range(max(row - 1, 0), min(row + 2, height))
+                for j in range(max(column - 1, 0), min(column + 2, width))
+                if (i, j) != (row, column)
+            )
+            for column in range(width)
+        )
+        for row in range(height)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def neighbor_masks(height, width):
+    """
+    Returns, for a board of the given size, a table indexed by board
+    index of the bitmask of cells adjacent to each cell.
+    """
+    return tuple(
+        sum(1 << (i * width + j) for i, j in cells)
+        for row in neighbor_table(height, width)
+        for cells in row
+    )
+
+
+def add(a, b):
+    """
+    Returns the elementwise sum of two lists of counts.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    return [x + (b[k] if k < len(b) else 0) for k, x in enumerate(a)]
 
-            # This is the 2nd
-            random_move = get_random_cell()
 
-        return random_move
+def shift(a, k):
+    """
+    Returns a list of counts indexed by number of mines, shifted by `k` mines.
+    """
+    return [0] * k + a
+
+
+def convolve(a, b):
+    """
+    Returns the counts of the sum of mines of two independent groups.
+    """
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] += x * y
+    return result
@@ -0,0 +1,132 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+from time import perf_counter
+
+from heredity import ENGINES, load_data
+
+FIELDS = ["file", "person", "gene_2", "gene_1", "gene_0", "trait_true", "trait_false", "seconds"]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Run heredity inference over many family files in parallel."
+    )
+    parser.add_argument("paths", nargs="+",
+                        help="family CSV files, or directories of them")
+    parser.add_argument("-e", "--engine", default="elimination", choices=ENGINES)
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("-f", "--format", default="csv", choices=["csv", "json"],
+                        help="csv: one row per person; json: one line per family")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write results here instead of standard output")
+    args = parser.parse_args()
+
+    files = family_files(args.paths)
+    if not files:
+        sys.exit("No family files found")
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        failures = run(files, args.engine, args.processes, args.format, output)
+    finally:
+        if args.output:
+            output.close()
+
+    if failures:
+        sys.exit(f"{failures} of {len(files)} families failed")
+
+
+def family_files(paths):
+    """
+    Return the CSV files named by `paths`, expanding directories to the
+    CSV files they contain, in sorted order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(".csv")
+            ))
+        else:
+            files.append(path)
+    return files
+
+
+def run(files, engine, processes, form, output):
+    """
+    Infer every family in `files` with `engine` on a pool of `processes`
+    workers, writing results to the `output` stream in `form` ("csv" or
+    "json") as each family finishes. Return the number of failures,
+    which are reported on standard error.
+    """
+    writer = None
+    if form == "csv":
+        writer = csv.DictWriter(output, FIELDS)
+        writer.writeheader()
+
+    failures = 0
+    tasks = [(filename, engine) for filename in files]
+    chunksize = max(1, len(tasks) // (8 * (processes or os.cpu_count())))
+    with multiprocessing.Pool(processes) as pool:
+        for filename, probabilities, seconds, error in pool.imap_unordered(infer_file, tasks, chunksize):
+            if error is not None:
+                failures += 1
+                print(f"{filename}: {error}", file=sys.stderr)
+                continue
+
+            if writer is not None:
+                for person, distribution in probabilities.items():
+                    writer.writerow({
+                        "file": filename,
+                        "person": person,
+                        "gene_2": distribution["gene"][2],
+                        "gene_1": distribution["gene"][1],
+                        "gene_0": distribution["gene"][0],
+                        "trait_true": distribution["trait"][True],
+                        "trait_false": distribution["trait"][False],
+                        "seconds": seconds
+                    })
+            else:
+                output.write(json.dumps({
+                    "file": filename,
+                    "seconds": seconds,
+                    "probabilities": {
+                        person: {
+                            "gene": {str(copies): p for copies, p in distribution["gene"].items()},
+                            "trait": {str(trait).lower(): p for trait, p in distribution["trait"].items()}
+                        }
+                        for person, distribution in probabilities.items()
+                    }
+                }) + "\n")
+
+    return failures
+
+
+def infer_file(task):
+    """
+    Load one family file and infer its probabilities with an engine,
+    given as a `(filename, engine)` pair.
+
+    Return the filename, the probabilities, the seconds taken to load
+    and infer, and None; or, if the family could not be processed, the
+    filename, None, None and the error message.
+    """
+    filename, engine = task
+    start = perf_counter()
+    try:
+        probabilities = ENGINES[engine](load_data(filename))
+    except Exception as e:
+        return filename, None, None, f"{type(e).__name__}: {e}"
+    return filename, probabilities, perf_counter() - start, None
+
+
+if __name__ == "__main__":
+    main()
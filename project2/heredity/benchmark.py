@@ -0,0 +1,213 @@
+import argparse
+import json
+import math
+import sys
+import tracemalloc
+
+from time import perf_counter
+
+import numpy as np
+
+from heredity import (
+    ENGINES, MAX_CLIQUE_ENTRIES, MAX_TENSOR_PEOPLE, JunctionTree, gene_prior,
+    gibbs_sampling, inheritance_table, likelihood_weighting, tensor_probabilities, trait_table
+)
+
+DEPTHS = [2, 4, 8]
+WIDTHS = [2, 8, 32]
+EVIDENCE = [0.2, 0.5]
+FAMILIES = 3
+SAMPLES = 100000
+SWEEPS = 2000
+
+# Largest family each exhaustive engine is run on
+LIMITS = {
+    "enumeration": 6,
+    "pruned": 9,
+    "tensor": MAX_TENSOR_PEOPLE
+}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Time the heredity engines on random pedigrees and report JSON."
+    )
+    parser.add_argument("--depths", nargs="+", type=int, default=DEPTHS,
+                        help="generations below the founders")
+    parser.add_argument("--widths", nargs="+", type=int, default=WIDTHS,
+                        help="people in each generation")
+    parser.add_argument("--evidence", nargs="+", type=float, default=EVIDENCE,
+                        help="share of people whose trait is known")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    parser.add_argument("-n", "--families", type=int, default=FAMILIES,
+                        help="pedigrees per depth, width and evidence share")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="particles for likelihood weighting")
+    parser.add_argument("--sweeps", type=int, default=SWEEPS,
+                        help="sweeps for Gibbs sampling")
+    parser.add_argument("--max-clique-entries", type=int, default=MAX_CLIQUE_ENTRIES,
+                        help="largest junction tree clique table solved exactly; "
+                             "above it, errors are not measured")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the JSON report here instead of standard output")
+    args = parser.parse_args()
+
+    if not all(0 <= share <= 1 for share in args.evidence):
+        sys.exit("Evidence shares must be between 0 and 1")
+
+    results = []
+    for depth in args.depths:
+        for width in args.widths:
+            for share in args.evidence:
+                for family in range(args.families):
+                    rng = np.random.default_rng([args.seed, depth, width, round(share * 1000), family])
+                    people = random_pedigree(depth, width, share, rng)
+                    # The junction tree is exact, so it serves as the reference when small enough
+                    tree = JunctionTree(people, max_entries=math.inf)
+                    largest = max(len(clique) for clique in tree.cliques)
+                    exact = 3 ** largest <= args.max_clique_entries
+                    reference = tree.probabilities() if exact else None
+
+                    # Check the reference against an independent exact engine where one fits
+                    reference_error = None
+                    if exact and len(people) <= MAX_TENSOR_PEOPLE:
+                        reference_error = max_error(tensor_probabilities(people), reference)
+
+                    for engine in args.engines:
+                        if len(people) > LIMITS.get(engine, len(people)):
+                            continue
+                        if engine == "elimination" and not exact:
+                            continue
+                        # The reference cannot measure the engine that computed it
+                        result = run(engine, people, args, None if engine == "elimination" else reference)
+                        result.update({
+                            "depth": depth,
+                            "width": width,
+                            "evidence": share,
+                            "family": family,
+                            "people": len(people),
+                            "known": sum(data["trait"] is not None for data in people.values()),
+                            "largest_clique": largest,
+                            "reference_error": reference_error
+                        })
+                        results.append(result)
+                        print(f"{depth}x{width} {share} #{family} {engine}: "
+                              f"{result['seconds']:.3f}s", file=sys.stderr)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+def run(engine, people, args, reference):
+    """
+    Run one engine on `people` and return a dictionary with its wall
+    time, peak traced memory in bytes, largest absolute error against
+    `reference` over every person's gene and trait probabilities (None
+    without a reference), and diagnostics (effective sample size or
+    R-hat) for the samplers.
+
+    The engine runs twice: once timed, and once with memory tracing,
+    whose overhead, heaviest on the pure Python engines, would otherwise
+    be counted in the time.
+    """
+    start = perf_counter()
+    probabilities, diagnostics = compute(engine, people, args)
+    seconds = perf_counter() - start
+
+    tracemalloc.start()
+    compute(engine, people, args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "engine": engine,
+        "seconds": seconds,
+        "peak_memory": peak,
+        "max_error": max_error(probabilities, reference),
+        "diagnostics": diagnostics
+    }
+
+
+def compute(engine, people, args):
+    """
+    Return the probabilities computed by one engine, and its diagnostics
+    (None except for the samplers).
+    """
+    if engine == "likelihood":
+        return likelihood_weighting(people, args.samples, seed=args.seed)
+    if engine == "gibbs":
+        return gibbs_sampling(people, args.sweeps, seed=args.seed)
+    return ENGINES[engine](people), None
+
+
+def max_error(probabilities, reference):
+    """
+    Return the largest absolute difference between two sets of gene and
+    trait probabilities, or None if `reference` is None.
+    """
+    if reference is None:
+        return None
+    return float(max(
+        abs(probabilities[person][field][value] - reference[person][field][value])
+        for person in reference
+        for field in reference[person]
+        for value in reference[person][field]
+    ))
+
+
+def random_pedigree(depth, width, evidence, rng):
+    """
+    Return a family in the form `load_data` returns, with `width`
+    founders followed by `depth` generations of `width` children each.
+
+    Each child's mother is drawn from the previous generation, and their
+    father either from it too (so families can intermarry) or, half of
+    the time, from a new founder marrying in. Genes and traits are
+    sampled from `PROBS`, and each trait is known with probability
+    `evidence`.
+    """
+    prior = gene_prior()
+    traits = trait_table()
+    inheritance = inheritance_table()
+
+    people = dict()
+    genes = dict()
+
+    def add(mother, father):
+        name = f"p{len(people)}"
+        if mother is None:
+            genes[name] = rng.choice(3, p=prior)
+        else:
+            genes[name] = rng.choice(3, p=inheritance[genes[mother], genes[father]])
+        trait = bool(rng.random() < traits[genes[name], 1])
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": trait if rng.random() < evidence else None
+        }
+        return name
+
+    generation = [add(None, None) for _ in range(width)]
+    for _ in range(depth):
+        children = []
+        for _ in range(width):
+            mother = generation[rng.integers(len(generation))]
+            others = [person for person in generation if person != mother]
+            if others and rng.random() < 0.5:
+                father = others[rng.integers(len(others))]
+            else:
+                father = add(None, None)
+            children.append(add(mother, father))
+        generation = children
+    return people
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import csv
 import itertools
+import math
 import sys
 
+import numpy as np
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,16 +39,50 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Largest family for which every joint assignment is tabulated at once
+MAX_TENSOR_PEOPLE = 14
+
+# Largest table over a junction tree clique's genes (3 ** people entries)
+MAX_CLIQUE_ENTRIES = 3 ** 15
+
+# Particles for likelihood weighting, and how many are sampled at once
+SAMPLES = 100000
+BATCH = 10000
+
+# Gibbs sampling sweeps, parallel chains, and share of sweeps discarded
+SWEEPS = 2000
+CHAINS = 16
+BURN_IN = 0.1
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python heredity.py data.csv [engine]")
     people = load_data(sys.argv[1])
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    # Choose how to compute the probabilities
+    engine = sys.argv[2] if len(sys.argv) == 3 else "elimination"
+    if engine not in ENGINES:
+        sys.exit(f"Unknown engine {engine}, choose from: {', '.join(ENGINES)}")
+    probabilities = ENGINES[engine](people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a probabilities dictionary with every entry at 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,6 +97,36 @@ def main():
         for person in people
     }
 
+
+def empty_log_probabilities(people):
+    """
+    Return a probabilities dictionary with every entry at log 0 (-inf).
+    """
+    return {
+        person: {
+            "gene": {
+                2: -np.inf,
+                1: -np.inf,
+                0: -np.inf
+            },
+            "trait": {
+                True: -np.inf,
+                False: -np.inf
+            }
+        }
+        for person in people
+    }
+
+
+def enumerate_probabilities(people):
+    """
+    Return the gene and trait distribution of each person by
+    enumerating every combination of genes and traits.
+    """
+
+    # Keep track of gene and trait log probabilities for each person
+    probabilities = empty_log_probabilities(people)
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
@@ -77,21 +144,13 @@ def main():
         for one_gene in powerset(names):
             for two_genes in powerset(names - one_gene):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+                # Update probabilities with new joint log probability
+                p = log_joint_probability(people, one_gene, two_genes, have_trait)
+                log_update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
-    normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    log_normalize(probabilities)
+    return probabilities
 
 
 def load_data(filename):
@@ -118,14 +177,13 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Yield all possible subsets of set s, one at a time.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
@@ -166,7 +224,7 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         result = prob * prob1
 
         # Update (create) the entry {parent: result}, in which dict it will be used for later operations
-        compare.update({parent: round(result, 4)})
+        compare.update({parent: result})
 
     # Next, go through the children
     for child in children:
@@ -202,7 +260,7 @@ def joint_probability(people, one_gene, two_genes, have_trait):
                       else prob_mother * prob_father if gene == 2 else (1 - prob_mother) * (1 - prob_father))
 
         # Get the result and update the dict
-        result = round(child_prob * prob1, 5)
+        result = child_prob * prob1
         compare.update({child: result})
 
     # Multiply all the probabilities to get the total and return it
@@ -212,6 +270,27 @@ def joint_probability(people, one_gene, two_genes, have_trait):
     return total
 
 
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Compute and return the natural log of the joint probability that
+    `joint_probability` computes, as a sum of each person's log
+    probability, so that it does not underflow in large families.
+    Impossible assignments have log probability -inf.
+    """
+    prior, traits, inheritance = LOG_PRIOR, LOG_TRAITS, LOG_INHERITANCE
+
+    genes = {person: (1 if person in one_gene else 2 if person in two_genes else 0) for person in people}
+    total = 0.0
+    for person, data in people.items():
+        gene = genes[person]
+        if data["mother"] is None:
+            total += prior[gene]
+        else:
+            total += inheritance[genes[data["mother"]]][genes[data["father"]]][gene]
+        total += traits[gene][int(person in have_trait)]
+    return total
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
@@ -237,6 +316,31 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
             probabilities[person]['trait'][False] += p
 
 
+def log_update(probabilities, one_gene, two_genes, have_trait, p):
+    """
+    Add to `probabilities`, which holds log probabilities, a new joint
+    log probability `p`, in the same entries as `update` would, by
+    log-sum-exp so that no sum underflows.
+    """
+    for person in probabilities:
+        gene = 1 if person in one_gene else 2 if person in two_genes else 0
+        trait = person in have_trait
+        distribution = probabilities[person]
+        distribution["gene"][gene] = log_add(distribution["gene"][gene], p)
+        distribution["trait"][trait] = log_add(distribution["trait"][trait], p)
+
+
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving log space.
+    """
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
 def normalize(probabilities):
     """
     Update `probabilities` such that each probability distribution
@@ -256,5 +360,720 @@ def normalize(probabilities):
                                           in probabilities[person]['trait'].items()}
 
 
+def log_normalize(probabilities):
+    """
+    Update `probabilities`, which holds log probabilities, such that each
+    distribution holds probabilities summing to 1, as `normalize` does.
+    Each distribution is shifted by its largest log probability before
+    leaving log space, so none underflows to 0.
+
+    Raise ValueError if no assignment is consistent with the known traits.
+    """
+    for person in probabilities:
+        for field in ("gene", "trait"):
+            logs = probabilities[person][field]
+            largest = max(logs.values())
+            if largest == -np.inf:
+                raise ValueError("No assignment of genes is consistent with the known traits")
+            weights = {key: np.exp(value - largest) for key, value in logs.items()}
+            total = sum(weights.values())
+            probabilities[person][field] = {key: float(weight / total) for key, weight in weights.items()}
+
+
+def pruned_probabilities(people):
+    """
+    Return the gene and trait distribution of each person, with the
+    same semantics as `enumerate_probabilities`, by the same search as
+    `pruned_assignments`.
+
+    Rather than updating every person at every complete assignment,
+    each branch returns the log of the total probability of all the
+    assignments below it. Adding that to the running partial sum gives
+    the probability of every assignment through the branch, which is
+    added to the assigned person's gene and trait entries once, so the
+    work grows with the number of branches rather than with the number
+    of assignments times the number of people.
+    """
+    order = topological_order(people)
+    prior, traits, inheritance = LOG_PRIOR, LOG_TRAITS, LOG_INHERITANCE
+    probabilities = empty_log_probabilities(people)
+    genes = dict()
+
+    def assign(n, p):
+        if n == len(order):
+            return 0.0
+
+        person = order[n]
+        mother, father, known = (people[person][key] for key in ("mother", "father", "trait"))
+        distribution = probabilities[person]
+        total = -math.inf
+        for gene in range(3):
+            if mother is None:
+                q = prior[gene]
+            else:
+                q = inheritance[genes[mother]][genes[father]][gene]
+
+            genes[person] = gene
+            for trait in ((True, False) if known is None else (known,)):
+                r = q + traits[gene][int(trait)]
+                if p + r == -math.inf:
+                    continue
+
+                # This person's factors and everything below the branch
+                below = r + assign(n + 1, p + r)
+                distribution["gene"][gene] = log_add(distribution["gene"][gene], p + below)
+                distribution["trait"][trait] = log_add(distribution["trait"][trait], p + below)
+                total = log_add(total, below)
+        return total
+
+    assign(0, 0.0)
+    log_normalize(probabilities)
+    return probabilities
+
+
+def pruned_assignments(people):
+    """
+    Yield `(one_gene, two_genes, have_trait, p)` for every assignment of
+    genes and traits consistent with the known traits, where `p` is the
+    natural log of its joint probability.
+
+    People are assigned parents first, so each person's log probability
+    can be added to a running partial sum as soon as they are assigned.
+    Known traits are never branched on, and a branch whose partial sum
+    is -inf (probability 0) is dropped before anyone else is assigned.
+    The yielded sets are reused between assignments, so copy them to
+    keep them.
+    """
+    order = topological_order(people)
+    prior, traits, inheritance = LOG_PRIOR, LOG_TRAITS, LOG_INHERITANCE
+
+    genes = dict()
+    one_gene, two_genes, have_trait = set(), set(), set()
+
+    def assign(n, p):
+        if n == len(order):
+            yield one_gene, two_genes, have_trait, p
+            return
+
+        person = order[n]
+        mother, father, known = (people[person][key] for key in ("mother", "father", "trait"))
+        for gene in range(3):
+            if mother is None:
+                q = p + prior[gene]
+            else:
+                q = p + inheritance[genes[mother]][genes[father]][gene]
+
+            genes[person] = gene
+            if gene == 1:
+                one_gene.add(person)
+            elif gene == 2:
+                two_genes.add(person)
+            for trait in ((True, False) if known is None else (known,)):
+                r = q + traits[gene][int(trait)]
+                if r == -math.inf:
+                    continue
+                if trait:
+                    have_trait.add(person)
+                yield from assign(n + 1, r)
+                have_trait.discard(person)
+            one_gene.discard(person)
+            two_genes.discard(person)
+
+    yield from assign(0, 0.0)
+
+
+def topological_order(people):
+    """
+    Return the people ordered so that parents come before their children.
+    """
+    order = []
+    placed = set()
+
+    def place(person):
+        if person in placed:
+            return
+        placed.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                place(parent)
+        order.append(person)
+
+    for person in people:
+        place(person)
+    return order
+
+
+def likelihood_weighting(people, samples=SAMPLES, seed=None):
+    """
+    Estimate the gene and trait distribution of each person by
+    likelihood weighting, and return it with a dictionary of diagnostics.
+
+    Particles are sampled in batches of `BATCH` at a time as NumPy
+    arrays: genes are drawn parents first from `PROBS`, and each
+    particle is weighted by the probability of the known traits given
+    its genes. Weights are kept as logs, and the running sums are
+    rescaled whenever a batch holds a larger weight than any before, so
+    many known traits do not underflow every weight to 0. Unknown traits
+    are not sampled; their distribution follows from the estimated
+    genes. The diagnostics report the number of `samples` and their
+    effective sample size `ess`, which falls far below `samples` when
+    the evidence is unlikely under the prior.
+    """
+    rng = np.random.default_rng(seed)
+    names, mothers, fathers, evidence = family_arrays(people)
+    prior = np.cumsum(gene_prior())
+    traits = np.array(LOG_TRAITS)
+    inheritance = np.cumsum(inheritance_table(), axis=2)
+
+    # Sums of weights, all relative to the largest log weight seen so far
+    counts = np.zeros((len(names), 3))
+    total = squares = 0
+    scale = -np.inf
+    for start in range(0, samples, BATCH):
+        size = min(BATCH, samples - start)
+        genes = np.empty((size, len(names)), dtype=np.int64)
+        log_weights = np.zeros(size)
+        for n in range(len(names)):
+            # Draw by inverting the cumulative distribution, guarding against rounding
+            u = rng.random(size)
+            if mothers[n] < 0:
+                drawn = np.searchsorted(prior, u, side="right")
+            else:
+                cumulative = inheritance[genes[:, mothers[n]], genes[:, fathers[n]]]
+                drawn = (u[:, None] >= cumulative).sum(axis=1)
+            genes[:, n] = np.minimum(drawn, 2)
+            if evidence[n] >= 0:
+                log_weights += traits[genes[:, n], evidence[n]]
+
+        largest = log_weights.max()
+        if largest == -np.inf:
+            continue
+        if largest > scale:
+            shrink = np.exp(scale - largest)
+            counts *= shrink
+            total *= shrink
+            squares *= shrink ** 2
+            scale = largest
+        weights = np.exp(log_weights - scale)
+        for n in range(len(names)):
+            counts[n] += np.bincount(genes[:, n], weights=weights, minlength=3)
+        total += weights.sum()
+        squares += (weights ** 2).sum()
+
+    if total == 0:
+        raise ValueError("No particle is consistent with the known traits; take more samples")
+    genes = {person: counts[n] / counts[n].sum() for n, person in enumerate(names)}
+    diagnostics = {"samples": samples, "ess": float(total ** 2 / squares)}
+    return marginal_probabilities(people, genes), diagnostics
+
+
+def gibbs_sampling(people, sweeps=SWEEPS, chains=CHAINS, seed=None):
+    """
+    Estimate the gene and trait distribution of each person by Gibbs
+    sampling, and return it with a dictionary of diagnostics.
+
+    `chains` independent chains run side by side as NumPy arrays. Each
+    sweep resamples every person's genes given everyone else's, from
+    their own factor and those of their children. The first `BURN_IN`
+    share of sweeps is discarded; after that, each person's conditional
+    gene distribution is averaged (rather than counting samples) for
+    lower variance. The diagnostics report `sweeps`, `chains` and
+    `r_hat`, the largest Gelman-Rubin statistic over every person and
+    gene count; values near 1 indicate the chains agree.
+    """
+    rng = np.random.default_rng(seed)
+    names, mothers, fathers, evidence = family_arrays(people)
+    prior = gene_prior()
+    traits = trait_table()
+    inheritance = inheritance_table()
+    size = len(names)
+
+    # Children of each person, as (child, is the person the mother)
+    children = [[] for _ in names]
+    for n in range(size):
+        if mothers[n] >= 0:
+            children[mothers[n]].append((n, True))
+            children[fathers[n]].append((n, False))
+
+    # Start from genes drawn from the prior
+    genes = np.empty((chains, size), dtype=np.int64)
+    for n in range(size):
+        if mothers[n] < 0:
+            genes[:, n] = rng.choice(3, size=chains, p=prior)
+        else:
+            genes[:, n] = [
+                rng.choice(3, p=inheritance[m, f])
+                for m, f in zip(genes[:, mothers[n]], genes[:, fathers[n]])
+            ]
+
+    burn_in = int(sweeps * BURN_IN)
+    kept = sweeps - burn_in
+    totals = np.zeros((chains, size, 3))
+    squares = np.zeros((chains, size, 3))
+    for sweep in range(sweeps):
+        for n in range(size):
+            if mothers[n] < 0:
+                conditional = np.tile(prior, (chains, 1))
+            else:
+                conditional = inheritance[genes[:, mothers[n]], genes[:, fathers[n]]].copy()
+            if evidence[n] >= 0:
+                conditional *= traits[:, evidence[n]]
+            for child, mother in children[n]:
+                if mother:
+                    conditional *= inheritance[:, genes[:, fathers[child]], genes[:, child]].T
+                else:
+                    conditional *= inheritance[genes[:, mothers[child]], :, genes[:, child]]
+            conditional /= conditional.sum(axis=1, keepdims=True)
+
+            u = rng.random(chains)
+            genes[:, n] = np.minimum((u[:, None] >= np.cumsum(conditional, axis=1)).sum(axis=1), 2)
+            if sweep >= burn_in:
+                totals[:, n] += conditional
+                squares[:, n] += conditional ** 2
+
+    means = totals / kept
+    estimate = means.mean(axis=0)
+    genes = {person: estimate[n] / estimate[n].sum() for n, person in enumerate(names)}
+    diagnostics = {"sweeps": sweeps, "chains": chains, "r_hat": r_hat(means, squares / kept, kept)}
+    return marginal_probabilities(people, genes), diagnostics
+
+
+def r_hat(means, squares, length):
+    """
+    Return the largest Gelman-Rubin statistic over the series whose
+    per-chain means and mean squares are given (chains on the first axis),
+    each chain having `length` draws.
+    """
+    chains = means.shape[0]
+    if chains < 2 or length < 2:
+        return float("nan")
+    within = ((squares - means ** 2) * length / (length - 1)).mean(axis=0)
+    between = length * means.var(axis=0, ddof=1)
+    pooled = (length - 1) / length * within + between / length
+    mixed = within > 1e-12
+    if not mixed.any():
+        return 1.0
+    return float(np.sqrt(pooled[mixed] / within[mixed]).max())
+
+
+def likelihood_probabilities(people):
+    """
+    Return the gene and trait distribution of each person estimated by
+    likelihood weighting.
+    """
+    return likelihood_weighting(people)[0]
+
+
+def gibbs_probabilities(people):
+    """
+    Return the gene and trait distribution of each person estimated by
+    Gibbs sampling.
+    """
+    return gibbs_sampling(people)[0]
+
+
+def family_arrays(people):
+    """
+    Return the people in topological order with, for each of them, the
+    positions of their mother and father in that order (-1 without
+    parents) and their known trait (1 or 0, or -1 if unknown), as arrays.
+    """
+    names = topological_order(people)
+    position = {person: n for n, person in enumerate(names)}
+    mothers = np.array([position.get(people[person]["mother"], -1) for person in names], dtype=np.int64)
+    fathers = np.array([position.get(people[person]["father"], -1) for person in names], dtype=np.int64)
+    evidence = np.array([
+        -1 if people[person]["trait"] is None else int(people[person]["trait"])
+        for person in names
+    ], dtype=np.int64)
+    return names, mothers, fathers, evidence
+
+
+def gene_prior():
+    """
+    Return the unconditional probability of 0, 1 and 2 gene copies.
+    """
+    return np.array([PROBS["gene"][gene] for gene in range(3)])
+
+
+def trait_table():
+    """
+    Return the table of P(trait | gene), indexed by gene copies and
+    then by trait (0 for False, 1 for True).
+    """
+    return np.array([
+        [PROBS["trait"][gene][False], PROBS["trait"][gene][True]]
+        for gene in range(3)
+    ])
+
+
+def inheritance_table():
+    """
+    Return the table of P(child's genes | mother's genes, father's genes),
+    indexed by mother's, father's and child's gene copies.
+    """
+    # Probability that a parent with 0, 1 or 2 copies passes the gene on
+    passes = [PROBS["mutation"], 0.5, 1 - PROBS["mutation"]]
+
+    table = np.zeros((3, 3, 3))
+    for mother in range(3):
+        for father in range(3):
+            m, f = passes[mother], passes[father]
+            table[mother, father] = [(1 - m) * (1 - f), m * (1 - f) + (1 - m) * f, m * f]
+    return table
+
+
+def log_tables():
+    """
+    Return the natural logs of `gene_prior`, `trait_table` and
+    `inheritance_table`, with -inf where a probability is 0.
+    """
+    with np.errstate(divide="ignore"):
+        return np.log(gene_prior()), np.log(trait_table()), np.log(inheritance_table())
+
+
+# Log tables as nested lists of floats, which index fastest in Python loops
+LOG_PRIOR, LOG_TRAITS, LOG_INHERITANCE = (table.tolist() for table in log_tables())
+
+
+def person_factors(people):
+    """
+    Return one factor per person as a `(scope, table)` pair: the
+    probability of their genes given their parents' genes (or the prior,
+    without parents), times the probability of their trait if it is known.
+    `scope` names the people whose gene copies index the table's axes.
+    """
+    prior = gene_prior()
+    traits = trait_table()
+    inheritance = inheritance_table()
+
+    factors = []
+    for person, data in people.items():
+        if data["mother"] is None:
+            scope, table = (person,), prior.copy()
+        else:
+            scope, table = (data["mother"], data["father"], person), inheritance.copy()
+        if data["trait"] is not None:
+            table *= traits[:, int(data["trait"])]
+        factors.append((scope, table))
+    return factors
+
+
+def tensor_probabilities(people):
+    """
+    Return the gene and trait distribution of each person from the table
+    of all joint gene assignments, consistent with the known traits,
+    built by a single tensor contraction of the person factors.
+    """
+    names = list(people)
+    check_tensor_size(names)
+    joint = contract(person_factors(people), names)
+
+    genes = dict()
+    for n, person in enumerate(names):
+        marginal = joint.sum(axis=tuple(axis for axis in range(len(names)) if axis != n))
+        genes[person] = marginal / marginal.sum()
+    return marginal_probabilities(people, genes)
+
+
+def check_tensor_size(names):
+    """
+    Raise ValueError if a table over the genes of `names` would be too large.
+    """
+    if len(names) > MAX_TENSOR_PEOPLE:
+        raise ValueError(
+            f"Joint tables cover at most {MAX_TENSOR_PEOPLE} people, not {len(names)}"
+        )
+
+
+def contract(factors, scope):
+    """
+    Multiply `(scope, table)` factors together and sum out every person
+    not in `scope`. Return the resulting table, with axes in `scope` order.
+    """
+    labels = dict()
+    operands = []
+    for factor_scope, table in factors:
+        operands.append(table)
+        operands.append([labels.setdefault(person, len(labels)) for person in factor_scope])
+    # People in `scope` that no factor mentions are uniform
+    for person in scope:
+        if person not in labels:
+            operands.append(np.ones(3))
+            operands.append([labels.setdefault(person, len(labels))])
+    if not operands:
+        return np.ones(())
+    output = [labels[person] for person in scope]
+    return np.einsum(*operands, output, optimize=len(factors) > 2)
+
+
+class JunctionTree():
+    """
+    Exact inference over the family's Bayesian network by message
+    passing on a junction tree, compiled once per family and reusable
+    across queries with different known traits.
+
+    People are eliminated one at a time (greedily, by fewest fill-in
+    edges); eliminating a person creates a clique of them and their
+    remaining neighbors in the moral graph, linked to the clique of the
+    next of those neighbors to be eliminated. Work is exponential only
+    in the largest clique, not in the number of people.
+
+    Clique potentials and messages are cached. When a query changes a
+    person's known trait, only the potential of the clique holding
+    their factor is rebuilt, along with the messages that depend on it:
+    those from it towards its root, and those flowing back out into the
+    rest of its tree. Messages inside unaffected subtrees, and anything
+    in other families' trees, are reused. Every message is scaled to sum
+    to 1, which leaves the normalized marginals unchanged but stops
+    products over many people from underflowing.
+
+    Raise ValueError if a clique's table would have more than
+    `max_entries` entries, which happens in heavily intermarried families.
+    """
+
+    def __init__(self, people, max_entries=MAX_CLIQUE_ENTRIES):
+        self.people = people
+        self.traits = {person: data["trait"] for person, data in people.items()}
+
+        # Parents-first order, with parents as positions in it
+        self.names, self.mothers, self.fathers, _ = family_arrays(people)
+
+        # Each person's factor without evidence
+        prior = gene_prior()
+        inheritance = inheritance_table()
+        self.factors = []
+        for n, person in enumerate(self.names):
+            if self.mothers[n] < 0:
+                self.factors.append(((person,), prior))
+            else:
+                parents = (self.names[self.mothers[n]], self.names[self.fathers[n]])
+                self.factors.append(((*parents, person), inheritance))
+
+        # Moral graph: each person is linked to their parents, and parents to each other
+        neighbors = {person: set() for person in self.names}
+        for scope, _ in self.factors:
+            for person in scope:
+                neighbors[person].update(scope)
+                neighbors[person].discard(person)
+
+        self.order = elimination_order(neighbors)
+        position = {person: n for n, person in enumerate(self.order)}
+
+        # Eliminating a person makes a clique with their remaining neighbors
+        self.cliques = []
+        self.parent = []
+        for person in self.order:
+            rest = sorted(neighbors[person], key=position.get)
+            self.cliques.append((person, *rest))
+            self.parent.append(position[rest[0]] if rest else None)
+            for neighbor in rest:
+                neighbors[neighbor].update(rest)
+                neighbors[neighbor].discard(neighbor)
+                neighbors[neighbor].discard(person)
+
+        # Tables over large cliques would not fit in memory
+        largest = max((len(clique) for clique in self.cliques), default=0)
+        if 3 ** largest > max_entries:
+            raise ValueError(
+                f"Junction tree has a clique of {largest} people, "
+                f"whose table of 3 ** {largest} entries exceeds {max_entries}"
+            )
+
+        self.children = [[] for _ in self.cliques]
+        for clique, parent in enumerate(self.parent):
+            if parent is not None:
+                self.children[parent].append(clique)
+
+        # Cliques from each one up to its root; parents always come later
+        self.ancestors = [None] * len(self.cliques)
+        for clique in reversed(range(len(self.cliques))):
+            parent = self.parent[clique]
+            self.ancestors[clique] = {clique} | (self.ancestors[parent] if parent is not None else set())
+        self.root = [max(ancestors) for ancestors in self.ancestors]
+
+        # Each factor, and its person's evidence, goes to the clique of the
+        # first of its people eliminated
+        self.assigned = [[] for _ in self.cliques]
+        self.home = dict()
+        for factor in self.factors:
+            clique = min(position[person] for person in factor[0])
+            self.assigned[clique].append(factor)
+            self.home[factor[0][-1]] = clique
+
+        self.potentials = dict()
+        self.up = dict()
+        self.down = dict()
+
+    def separator(self, clique):
+        """
+        Return the people shared by a clique and its parent.
+        """
+        return self.cliques[clique][1:]
+
+    def set_traits(self, traits):
+        """
+        Update the known traits from a dictionary mapping people to True,
+        False or None (unknown), discarding only the cached potentials
+        and messages that depend on the people whose trait changed.
+        """
+        changed = [
+            self.home[person] for person, trait in traits.items()
+            if self.traits[person] != trait
+        ]
+        self.traits.update(traits)
+
+        for clique in set(changed):
+            self.potentials.pop(clique, None)
+            for ancestor in self.ancestors[clique]:
+                self.up.pop(ancestor, None)
+
+            # Messages into the tree away from the change depend on it
+            for other in range(len(self.cliques)):
+                if self.root[other] == self.root[clique] and other not in self.ancestors[clique]:
+                    self.down.pop(other, None)
+
+    def potential(self, clique):
+        """
+        Return the product of the factors and evidence assigned to a clique.
+        """
+        if clique not in self.potentials:
+            traits = trait_table()
+            factors = list(self.assigned[clique])
+            for scope, _ in self.assigned[clique]:
+                trait = self.traits[scope[-1]]
+                if trait is not None:
+                    factors.append(((scope[-1],), traits[:, int(trait)]))
+            self.potentials[clique] = contract(factors, self.cliques[clique])
+        return self.potentials[clique]
+
+    def incoming(self, clique, exclude=None):
+        """
+        Return the cached messages into a clique, except from `exclude`.
+        """
+        messages = [(self.separator(child), self.up[child]) for child in self.children[clique] if child != exclude]
+        if self.parent[clique] is not None and self.parent[clique] != exclude:
+            messages.append((self.separator(clique), self.down[clique]))
+        return messages
+
+    def query(self, traits=None):
+        """
+        Return the gene and trait distribution of each person, in the
+        same form as `normalize` leaves `probabilities`, after updating
+        the known traits with `traits` if given (see `set_traits`).
+        """
+        if traits:
+            self.set_traits(traits)
+        cliques = range(len(self.cliques))
+
+        # Messages towards the root, leaves first, then back out
+        for c in cliques:
+            if c not in self.up:
+                messages = [(self.separator(child), self.up[child]) for child in self.children[c]]
+                self.up[c] = scaled(contract([(self.cliques[c], self.potential(c))] + messages, self.separator(c)))
+        for c in reversed(cliques):
+            for child in self.children[c]:
+                if child not in self.down:
+                    messages = self.incoming(c, exclude=child)
+                    self.down[child] = scaled(contract(
+                        [(self.cliques[c], self.potential(c))] + messages, self.separator(child)
+                    ))
+
+        # Each person's marginal comes from the clique eliminating them
+        genes = dict()
+        for c in cliques:
+            marginal = contract(
+                [(self.cliques[c], self.potential(c))] + self.incoming(c), self.cliques[c][:1]
+            )
+            genes[self.order[c]] = marginal / marginal.sum()
+
+        people = {person: dict(data, trait=self.traits[person]) for person, data in self.people.items()}
+        return marginal_probabilities(people, genes)
+
+    def probabilities(self):
+        """
+        Return the gene and trait distribution of each person, given the
+        known traits the tree was built or last queried with.
+        """
+        return self.query()
+
+
+def scaled(message):
+    """
+    Return `message` divided by its sum.
+
+    Raise ValueError if it is all 0, which means the known traits are impossible.
+    """
+    total = message.sum()
+    if total == 0:
+        raise ValueError("No assignment of genes is consistent with the known traits")
+    return message / total
+
+
+def elimination_order(neighbors):
+    """
+    Return an order in which to eliminate the people in the undirected
+    graph `neighbors`, greedily choosing whoever adds the fewest edges
+    between their remaining neighbors (ties broken by fewest neighbors).
+    """
+    neighbors = {person: set(linked) for person, linked in neighbors.items()}
+    order = []
+    while neighbors:
+        def fill(person):
+            linked = list(neighbors[person])
+            missing = sum(
+                1 for i, a in enumerate(linked) for b in linked[i + 1:]
+                if b not in neighbors[a]
+            )
+            return missing, len(linked), str(person)
+
+        person = min(neighbors, key=fill)
+        linked = neighbors.pop(person)
+        for neighbor in linked:
+            neighbors[neighbor].discard(person)
+            neighbors[neighbor].update(linked - {neighbor})
+        order.append(person)
+    return order
+
+
+def marginal_probabilities(people, genes):
+    """
+    Return a probabilities dictionary from each person's gene
+    distribution `genes[person]`, indexed by gene copies. A known trait
+    has probability 1; otherwise its distribution follows from the genes.
+    """
+    traits = trait_table()
+    probabilities = empty_probabilities(people)
+    for person in people:
+        gene = genes[person]
+        probabilities[person]["gene"] = {copies: float(gene[copies]) for copies in (2, 1, 0)}
+
+        known = people[person]["trait"]
+        if known is None:
+            trait = gene @ traits
+            probabilities[person]["trait"] = {True: float(trait[1]), False: float(trait[0])}
+        else:
+            probabilities[person]["trait"] = {True: float(known), False: float(not known)}
+    return probabilities
+
+
+def elimination_probabilities(people):
+    """
+    Return the gene and trait distribution of each person by exact
+    inference on a junction tree.
+    """
+    return JunctionTree(people).probabilities()
+
+
+ENGINES = {
+    "elimination": elimination_probabilities,
+    "tensor": tensor_probabilities,
+    "pruned": pruned_probabilities,
+    "enumeration": enumerate_probabilities,
+    "likelihood": likelihood_probabilities,
+    "gibbs": gibbs_probabilities
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from time import perf_counter
+
+import numpy as np
+
+from pagerank import (
+    DAMPING, EDGE, LinkGraph, SOLVERS, batch_pagerank, memmap_pagerank,
+    parallel_pagerank, push_pagerank, random_surfers, solve_pagerank
+)
+
+GRAPHS = ["random", "scale-free", "web"]
+SIZES = [1000, 100000]
+ENGINES = ["sample", *SOLVERS, "push", "batch", "memmap", "parallel"]
+DEGREE = 8
+DANGLING = 0.1
+TOLERANCE = 1e-8
+SAMPLES = 1000000
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Time the PageRank engines on synthetic graphs and report JSON."
+    )
+    parser.add_argument("--graphs", nargs="+", default=GRAPHS, choices=GRAPHS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES,
+                        help="number of pages")
+    parser.add_argument("--engines", nargs="+", default=ENGINES, choices=ENGINES)
+    parser.add_argument("--degree", type=float, default=DEGREE,
+                        help="average number of links per page")
+    parser.add_argument("--dangling", type=float, default=DANGLING,
+                        help="share of pages without links")
+    parser.add_argument("--damping", type=float, default=DAMPING)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="samples taken by the sampling engine")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="workers for the parallel engine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the JSON report here instead of standard output")
+    args = parser.parse_args()
+
+    if not 0 <= args.dangling < 1:
+        sys.exit("Dangling share must be at least 0 and below 1")
+
+    results = []
+    for kind in args.graphs:
+        for size in args.sizes:
+            rng = np.random.default_rng([args.seed, size, GRAPHS.index(kind)])
+            graph = GENERATORS[kind](size, args.degree, args.dangling, rng)
+            reference, _ = solve_pagerank(graph, args.damping, tolerance=1e-14, max_iterations=100000)
+            for engine in args.engines:
+                result = run(engine, graph, args, reference)
+                result.update({
+                    "graph": kind,
+                    "pages": size,
+                    "links": int(graph.out_degree.sum()),
+                    "dangling": int(graph.dangling.sum())
+                })
+                results.append(result)
+                print(f"{kind} {size} {engine}: {result['seconds']:.3f}s", file=sys.stderr)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+def run(engine, graph, args, reference):
+    """
+    Run one engine on `graph` and return a dictionary with its wall
+    time, iterations (None for sampling), peak traced memory in bytes
+    and L1 error against `reference`.
+
+    The engine runs twice: once timed, and once with memory tracing,
+    whose overhead would otherwise be counted in the time. Both runs
+    start without the graph's cached transition matrix, so every engine
+    pays for building it.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+
+        # The out-of-core engine reads its graph from disk
+        path = os.path.join(directory, "edges")
+        if engine == "memmap":
+            write_edges(graph, path)
+
+        graph.matrix = None
+        start = perf_counter()
+        ranks, iterations = compute(engine, graph, args, path)
+        seconds = perf_counter() - start
+
+        graph.matrix = None
+        tracemalloc.start()
+        compute(engine, graph, args, path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "engine": engine,
+        "seconds": seconds,
+        "iterations": iterations,
+        "peak_memory": peak,
+        "l1_error": float(np.abs(ranks - reference).sum())
+    }
+
+
+def compute(engine, graph, args, path):
+    """
+    Return the ranks computed by one engine, and its iterations (None
+    for sampling and pushing). The memmap engine reads the edge list at
+    `path`.
+    """
+    if engine == "sample":
+        return random_surfers(graph, args.damping, args.samples, seed=args.seed), None
+    if engine in SOLVERS:
+        ranks, metrics = solve_pagerank(graph, args.damping, engine, args.tolerance)
+        return ranks, len(metrics)
+    if engine == "push":
+        return push_pagerank(graph, args.damping, np.full(len(graph), 1 / len(graph)), args.tolerance), None
+    if engine == "batch":
+        ranks, iterations = batch_pagerank(graph, args.damping, np.ones((len(graph), 1)), args.tolerance)
+        return ranks[:, 0], iterations
+    if engine == "memmap":
+        ranks, metrics = memmap_pagerank(path, args.damping, args.tolerance)
+        return ranks, len(metrics)
+    ranks, metrics = parallel_pagerank(graph, args.damping, args.processes, args.tolerance)
+    return ranks, len(metrics)
+
+
+def write_edges(graph, path):
+    """
+    Write `graph` in the edge list format of `crawl_to_edges`.
+    """
+    edges = np.empty(len(graph.indices), dtype=EDGE)
+    edges["source"] = np.repeat(np.arange(len(graph)), graph.out_degree)
+    edges["target"] = graph.indices
+    edges.tofile(path)
+    with open(path + ".pages", "w") as f:
+        f.writelines(f"{page}\n" for page in graph.pages)
+
+
+def random_graph(n, degree, dangling, rng):
+    """
+    Return a graph of `n` pages where links join pages chosen uniformly.
+    """
+    links = int(n * degree)
+    return build(n, rng.integers(n, size=links), rng.integers(n, size=links), dangling, rng)
+
+
+def scale_free_graph(n, degree, dangling, rng):
+    """
+    Return a graph of `n` pages whose in- and out-degrees follow power
+    laws (exponents about 2.1 and 2.7), by choosing each link's ends in
+    proportion to power-law page weights.
+    """
+    links = int(n * degree)
+    ranks = np.arange(1, n + 1)
+    incoming = ranks ** (-1 / 1.1)
+    outgoing = ranks ** (-1 / 1.7)
+    sources = rng.permutation(n)[rng.choice(n, size=links, p=outgoing / outgoing.sum())]
+    targets = rng.permutation(n)[rng.choice(n, size=links, p=incoming / incoming.sum())]
+    return build(n, sources, targets, dangling, rng)
+
+
+def web_graph(n, degree, dangling, rng, site_size=100, local=0.8):
+    """
+    Return a graph of `n` pages grouped into sites of about `site_size`
+    consecutive pages, where a share `local` of links stay within the
+    page's site and the rest point to pages across the web chosen with
+    power-law popularity.
+    """
+    links = int(n * degree)
+    sources = rng.integers(n, size=links)
+    targets = sources - sources % site_size + rng.integers(site_size, size=links)
+    outside = rng.random(links) >= local
+    popularity = np.arange(1, n + 1) ** -1.0
+    order = rng.permutation(n)
+    targets[outside] = order[rng.choice(n, size=outside.sum(), p=popularity / popularity.sum())]
+    return build(n, sources, np.minimum(targets, n - 1), dangling, rng)
+
+
+def build(n, sources, targets, dangling, rng):
+    """
+    Return the `LinkGraph` of the given links without self links,
+    after removing every link out of a random share `dangling` of pages.
+    """
+    keep = rng.random(n) >= dangling
+    kept = keep[sources] & (sources != targets)
+    pages = [f"{i}.html" for i in range(n)]
+    return LinkGraph.from_edges(pages, sources[kept], targets[kept])
+
+
+GENERATORS = {
+    "random": random_graph,
+    "scale-free": scale_free_graph,
+    "web": web_graph
+}
+
+
+if __name__ == "__main__":
+    main()
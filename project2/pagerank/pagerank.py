@@ -1,10 +1,36 @@
+import functools
+import math
+import multiprocessing
 import os
+import posixpath
 import random
 import re
 import sys
+import urllib.parse
+
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve_triangular
 
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 1000
+WALKERS = 4096
+BATCH = 1 << 20
+PUSH_FRACTION = 0.1
+EXTRAPOLATE_EVERY = 10
+CHUNK_SIZE = 1 << 22
+BLOCK_COLUMNS = 16
+
+# Anchor targets in an HTML page
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Binary edge list record, one per link
+EDGE = np.dtype([("source", "<i4"), ("target", "<i4")])
 
 
 def main():
@@ -34,9 +60,7 @@ def crawl(directory):
         if not filename.endswith(".html"):
             continue
         with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+            pages[filename] = extract_links(f.read(), filename)
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -48,6 +72,150 @@ def crawl(directory):
     return pages
 
 
+def extract_links(contents, filename):
+    """
+    Return the set of pages linked to by the HTML `contents` of page
+    `filename`, other than the page itself. Relative links are resolved
+    against the page's directory, and fragments and queries are dropped,
+    so that `./2.html#top` from `1.html` becomes `2.html`. Links to other
+    sites are ignored.
+    """
+    links = set()
+    base = posixpath.dirname(filename)
+    for link in LINK.findall(contents):
+        url = urllib.parse.urlsplit(link)
+        if url.scheme or url.netloc or not url.path:
+            continue
+        path = posixpath.normpath(posixpath.join(base, url.path))
+        if path != filename and not path.startswith("../"):
+            links.add(path)
+    return links
+
+
+def parse_page(directory, filename):
+    """
+    Return `filename` and the set of pages linked to by it.
+    """
+    with open(os.path.join(directory, filename)) as f:
+        return filename, extract_links(f.read(), filename)
+
+
+def crawl_to_edges(directory, output, processes=None):
+    """
+    Parse a directory of HTML pages on a pool of `processes` workers and
+    write the links between them to the binary edge list `output`.
+
+    Pages are numbered in sorted filename order, and their names are
+    written one per line to `output + ".pages"`. The edge list holds one
+    `(source, target)` pair of little-endian 32-bit page numbers per link,
+    grouped by source in ascending order. Links are written as each page
+    is parsed, so only one page's links are held in memory at a time.
+
+    Return the number of pages and of links written.
+    """
+    names = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.name.endswith(".html") and entry.is_file()
+    )
+    ids = {name: i for i, name in enumerate(names)}
+
+    with open(output + ".pages", "w") as f:
+        for name in names:
+            f.write(name + "\n")
+
+    links = 0
+    with open(output, "wb") as f, multiprocessing.Pool(processes) as pool:
+        parsed = pool.imap(functools.partial(parse_page, directory), names, chunksize=64)
+        for name, targets in parsed:
+            targets = sorted(ids[target] for target in targets if target in ids)
+            edges = np.empty(len(targets), dtype=EDGE)
+            edges["source"] = ids[name]
+            edges["target"] = targets
+            edges.tofile(f)
+            links += len(targets)
+
+    return len(names), links
+
+
+def load_edges(path):
+    """
+    Return the `LinkGraph` stored by `crawl_to_edges` at `path`.
+    """
+    with open(path + ".pages") as f:
+        pages = f.read().splitlines()
+    edges = np.fromfile(path, dtype=EDGE)
+    return LinkGraph.from_edges(pages, edges["source"], edges["target"])
+
+
+class LinkGraph():
+    """
+    Link structure of a corpus, with pages numbered from 0 in `pages`
+    order and the links out of each page stored in compressed sparse
+    row form: page `i` links to `indices[indptr[i]:indptr[i + 1]]`.
+    """
+
+    def __init__(self, pages, indptr, indices):
+        self.pages = list(pages)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.out_degree = np.diff(self.indptr)
+        self.dangling = self.out_degree == 0
+        self.matrix = None
+
+    def __len__(self):
+        return len(self.pages)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build the graph of a corpus as returned by `crawl`.
+        Links to pages outside the corpus are ignored.
+        """
+        pages = sorted(corpus)
+        ids = {page: i for i, page in enumerate(pages)}
+        indptr = [0]
+        indices = []
+        for page in pages:
+            indices.extend(sorted(ids[link] for link in corpus[page] if link in ids))
+            indptr.append(len(indices))
+        return cls(pages, indptr, indices)
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Build the graph from parallel arrays of link sources and targets,
+        given as page numbers. Repeated links are counted once.
+        """
+        n = len(pages)
+        links = sparse.coo_matrix(
+            (np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n, n)
+        ).tocsr()
+        links.sum_duplicates()
+        links.sort_indices()
+        return cls(pages, links.indptr, links.indices)
+
+    def transition_matrix(self):
+        """
+        Return the sparse matrix `M` with `M[j, i] = 1 / out_degree[i]`
+        for each link from page `i` to page `j`, so that `M @ ranks`
+        is the rank each page receives along links. Dangling pages
+        (without links) have empty columns and are handled separately.
+        """
+        if self.matrix is None:
+            n = len(self)
+            weights = np.repeat(1 / np.maximum(self.out_degree, 1), self.out_degree)
+            self.matrix = sparse.csc_matrix(
+                (weights, self.indices, self.indptr), shape=(n, n)
+            ).tocsr()
+        return self.matrix
+
+    def ranks(self, values):
+        """
+        Return a dictionary mapping each page name to its value in `values`.
+        """
+        return {page: float(value) for page, value in zip(self.pages, values)}
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -89,110 +257,646 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # Initiate list for samples
-    samples = []
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.ranks(random_surfers(graph, damping_factor, n))
+
+
+def random_surfers(graph, damping_factor, n, walkers=WALKERS, seed=None):
+    """
+    Return the share of `n` samples spent on each page of a `LinkGraph`
+    by random surfers following the transition model.
+
+    Up to `walkers` surfers move together as NumPy arrays. Each starts at
+    a page at random and takes `burn_in_steps` unrecorded steps first, so
+    that samples do not favour the starting pages. Following a link picks
+    uniformly from the page's CSR link array; visits are tallied with
+    `bincount` in batches. Without a `seed`, one is drawn from `random`.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    rng = np.random.default_rng(seed)
+
+    size = len(graph)
+    walkers = max(1, min(walkers, n))
+    pages = rng.integers(size, size=walkers)
+
+    def step(pages):
+        degree = graph.out_degree[pages]
+        follow = (rng.random(len(pages)) < damping_factor) & (degree > 0)
+        following = pages[follow]
+        offsets = (rng.random(len(following)) * degree[follow]).astype(np.int64)
+        new = rng.integers(size, size=len(pages))
+        new[follow] = graph.indices[graph.indptr[following] + offsets]
+        return new
+
+    for _ in range(burn_in_steps(damping_factor)):
+        pages = step(pages)
+
+    visits = np.zeros(size, dtype=np.int64)
+    batch = []
+    batched = 0
+    remaining = n
+    while remaining > 0:
+        if remaining < walkers:
+            pages = pages[:remaining]
+        batch.append(pages)
+        batched += len(pages)
+        remaining -= len(pages)
+        if batched >= BATCH or remaining == 0:
+            visits += np.bincount(np.concatenate(batch), minlength=size)
+            batch = []
+            batched = 0
+        if remaining > 0:
+            pages = step(pages)
+
+    return visits / n
+
+
+def burn_in_steps(damping_factor, precision=1e-6):
+    """
+    Return how many steps a surfer needs before its position is within
+    `precision` of the stationary distribution; the distance from it
+    shrinks by a factor `damping_factor` each step.
+    """
+    if damping_factor <= 0:
+        return 0
+    return math.ceil(math.log(precision) / math.log(damping_factor))
+
+
+def iterate_pagerank(corpus, damping_factor, method="power",
+                     tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page by iteratively updating
+    PageRank values until convergence.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
 
-    # Copy the corpus items
-    ncpy = list(corpus.copy().items())
+    `method` names one of the `SOLVERS`; see `solve_pagerank`.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks, _ = solve_pagerank(graph, damping_factor, method, tolerance, max_iterations)
+    return graph.ranks(ranks)
 
-    # Choose randomly the first page and take the key part of the key-value pair
-    page = random.choice(ncpy)
-    page = page[0]
 
-    # Decrease n by one and append the first page in the samples list
-    n -= 1
-    samples.append(page)
+def solve_pagerank(graph, damping_factor, method="power",
+                   tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of a `LinkGraph` and a list of metrics,
+    one dictionary per iteration with its L1 `residual` and the `time`
+    in seconds since the start.
+
+    Starting from 1/n for every page, the solver named `method` is
+    applied until the L1 residual falls below `tolerance` or
+    `max_iterations` is reached:
+        * "power": power iteration
+        * "jacobi": Jacobi iteration on the linear PageRank system
+        * "gauss-seidel": Gauss-Seidel sweeps, using ranks updated
+          earlier in the same sweep
+        * "aitken": power iteration with Aitken extrapolation applied
+          every `EXTRAPOLATE_EVERY` iterations, kept only when it lowers
+          the L1 residual
+
+    A page with no links is treated as linking to every page, including
+    itself; rather than materializing those links, the rank of dangling
+    pages is spread uniformly as a rank-one correction.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown PageRank solver: {method}")
+
+    n = len(graph)
+    step = SOLVERS[method](graph, damping_factor)
+    ranks = np.full(n, 1 / n)
+    history = [ranks]
+    metrics = []
+    start = perf_counter()
+
+    r = residual(graph, damping_factor, ranks)
+    for iteration in range(1, max_iterations + 1):
+        error = np.abs(r).sum()
+        metrics.append({"iteration": iteration, "residual": error, "time": perf_counter() - start})
+        if error < tolerance:
+            break
+
+        ranks = step(ranks, r)
+        r = residual(graph, damping_factor, ranks)
+        if method == "aitken":
+            history = history[-2:] + [ranks]
+            if iteration % EXTRAPOLATE_EVERY == 0:
+
+                # Keep the extrapolation only if it is closer to a solution
+                extrapolated = aitken(*history)
+                extrapolated_r = residual(graph, damping_factor, extrapolated)
+                if np.abs(extrapolated_r).sum() < np.abs(r).sum():
+                    ranks, r = extrapolated, extrapolated_r
+
+    return ranks / ranks.sum(), metrics
+
+
+def personalized_pagerank(corpus, damping_factor, personalization,
+                          tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return personalized PageRank values for each page: like
+    `iterate_pagerank`, but with probability `1 - damping_factor` (and
+    from pages without links) the surfer jumps to a page chosen in
+    proportion to `personalization`, a dictionary of page weights.
+    Pages missing from `personalization` have weight 0.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    teleport = np.array([[personalization.get(page, 0)] for page in graph.pages], dtype=float)
+    ranks, _ = batch_pagerank(graph, damping_factor, teleport, tolerance, max_iterations)
+    return graph.ranks(ranks[:, 0])
 
-    # Repeat for all remaining sample slots
-    for sample in range(n):
 
-        # Choose randomly from the weighted transition_model output
-        page = random.choices(ncpy, transition_model(corpus, page, damping_factor).values())
-        page = page[0][0]
-        samples.append(page)
+def batch_pagerank(graph, damping_factor, teleport,
+                   tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return the personalized PageRank vectors of a `LinkGraph` for many
+    teleport vectors at once, and the largest number of iterations taken.
+
+    `teleport` is an `(n, k)` array whose columns are the teleport
+    weights of each personalization (normalized here). Columns are
+    iterated together in blocks of `BLOCK_COLUMNS`, so each iteration is
+    one sparse matrix times dense block product; a block stops once
+    every column's L1 change is below `tolerance`.
+    """
+    teleport = np.asarray(teleport, dtype=float)
+    if teleport.ndim != 2 or teleport.shape[0] != len(graph):
+        raise ValueError("teleport must have one row per page")
+    totals = teleport.sum(axis=0)
+    if (teleport < 0).any() or (totals <= 0).any():
+        raise ValueError("teleport weights must be non-negative with a positive total per column")
+    teleport = teleport / totals
+
+    matrix = damping_factor * graph.transition_matrix()
+    ranks = np.empty_like(teleport)
+    iterations = 0
+
+    for start in range(0, teleport.shape[1], BLOCK_COLUMNS):
+        block = teleport[:, start:start + BLOCK_COLUMNS]
+        current = block.copy()
+        scratch = np.empty_like(current)
+
+        # Personalizations usually name a few pages, so only add the
+        # nonzero teleport weights each iteration
+        rows, columns = np.nonzero(block)
+        weights = block[rows, columns]
+
+        for iteration in range(1, max_iterations + 1):
+            # Rank on dangling pages jumps like a teleport
+            jump = damping_factor * current[graph.dangling].sum(axis=0) + 1 - damping_factor
+            new = matrix @ current
+            new[rows, columns] += weights * jump[columns]
+
+            np.subtract(new, current, out=scratch)
+            change = np.abs(scratch, out=scratch).sum(axis=0).max()
+            current = new
+            if change < tolerance:
+                break
+
+        ranks[:, start:start + BLOCK_COLUMNS] = current / current.sum(axis=0)
+        iterations = max(iterations, iteration)
+
+    return ranks, iterations
+
+
+def memmap_pagerank(path, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, chunk_size=CHUNK_SIZE):
+    """
+    Return the PageRank vector of the edge list written by
+    `crawl_to_edges` at `path`, in the order of its pages file, and the
+    per-iteration metrics as returned by `solve_pagerank`.
+
+    The edge list is memory-mapped and never loaded whole; each power
+    iteration streams over it in chunks of `chunk_size` links and sums
+    the rank passed along each link with `np.bincount`, so only the rank
+    vectors and out-degrees are held in memory. Since links are grouped
+    by source, each chunk reads the current ranks sequentially. Damping
+    and dangling pages are handled as in `solve_pagerank`.
+    """
+    with open(path + ".pages") as f:
+        n = sum(1 for _ in f)
+
+    # An empty file cannot be mapped, but is a valid graph without links
+    if os.path.getsize(path) == 0:
+        edges = np.empty(0, dtype=EDGE)
+    else:
+        edges = np.memmap(path, dtype=EDGE, mode="r")
+
+    def chunks():
+        for start in range(0, len(edges), chunk_size):
+            chunk = edges[start:start + chunk_size]
+            yield chunk["source"], chunk["target"]
+
+    # First pass: count the links out of each page
+    out_degree = np.zeros(n, dtype=np.int64)
+    for sources, _ in chunks():
+        out_degree += np.bincount(sources, minlength=n)
+    dangling = out_degree == 0
+    share = damping_factor / np.maximum(out_degree, 1)
+
+    ranks = np.full(n, 1 / n)
+    metrics = []
+    start = perf_counter()
+
+    for iteration in range(1, max_iterations + 1):
+        new = np.full(n, (damping_factor * ranks[dangling].sum() + 1 - damping_factor) / n)
+        passed = ranks * share
+        for sources, targets in chunks():
+            new += np.bincount(targets, weights=passed[sources], minlength=n)
+
+        error = np.abs(new - ranks).sum()
+        metrics.append({"iteration": iteration, "residual": error, "time": perf_counter() - start})
+        ranks = new
+        if error < tolerance:
+            break
+
+    return ranks / ranks.sum(), metrics
+
+
+def parallel_pagerank(graph, damping_factor, processes=None,
+                      tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of a `LinkGraph` and the per-iteration
+    metrics, as `solve_pagerank` does for power iteration, with each
+    iteration's sparse mat-vec split across a pool of `processes` workers.
+
+    The transition matrix and both rank vectors live in shared memory.
+    Its rows are split into one block per worker with about the same
+    number of links each; every iteration, each worker computes the
+    rank its pages receive, and the pool synchronizes once before the
+    damping and dangling terms are applied.
+    """
+    processes = processes or os.cpu_count()
+    n = len(graph)
+    matrix = graph.transition_matrix()
+
+    # Row blocks holding about the same number of links
+    cuts = np.searchsorted(matrix.indptr, np.linspace(0, matrix.nnz, processes + 1))
+    cuts[0], cuts[-1] = 0, n
+    bounds = sorted(set(cuts.tolist()))
+    blocks = list(zip(bounds[:-1], bounds[1:]))
+
+    arrays = {
+        "indptr": matrix.indptr,
+        "indices": matrix.indices,
+        "data": matrix.data,
+        "ranks": np.full(n, 1 / n),
+        "received": np.zeros(n)
+    }
+    memory = dict()
+    try:
+        shared = dict()
+        specs = dict()
+        for name, array in arrays.items():
+            memory[name] = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=memory[name].buf)
+            shared[name][:] = array
+            specs[name] = (memory[name].name, array.shape, array.dtype.str)
+        ranks = shared["ranks"]
+        received = shared["received"]
+
+        metrics = []
+        start = perf_counter()
+        with multiprocessing.Pool(processes, initializer=attach_shared, initargs=(specs, n)) as pool:
+            for iteration in range(1, max_iterations + 1):
+                pool.map(receive_rank, blocks)
+
+                new = received * damping_factor
+                new += (damping_factor * ranks[graph.dangling].sum() + 1 - damping_factor) / n
+                error = np.abs(new - ranks).sum()
+                metrics.append({"iteration": iteration, "residual": error, "time": perf_counter() - start})
+                ranks[:] = new
+                if error < tolerance:
+                    break
+
+        result = ranks / ranks.sum()
+    finally:
+        # Views into shared memory must be gone before it is closed
+        shared = ranks = received = None
+        for block in memory.values():
+            block.close()
+            block.unlink()
+
+    return result, metrics
+
+
+# Shared arrays and matrix blocks of a `parallel_pagerank` worker
+worker = dict()
+
+
+def attach_shared(specs, n):
+    """
+    Attach a `parallel_pagerank` worker to the shared arrays.
+    """
+    worker.clear()
+    worker["n"] = n
+    worker["memory"] = []
+    for name, (memory_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=memory_name)
+        worker["memory"].append(block)
+        worker[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    worker["blocks"] = dict()
 
-    # Count how many times each sample is found in samples[]
-    false_pagerank = {i: samples.count(i) for i in samples}
 
-    pagerank = {}
+def receive_rank(block):
+    """
+    Compute, in a `parallel_pagerank` worker, the rank received along
+    links by the pages in `block`, a `(first, last)` range of rows.
+    """
+    first, last = block
+    if block not in worker["blocks"]:
+        start, end = worker["indptr"][first], worker["indptr"][last]
+        worker["blocks"][block] = sparse.csr_matrix(
+            (worker["data"][start:end], worker["indices"][start:end],
+             worker["indptr"][first:last + 1] - start),
+            shape=(last - first, worker["n"])
+        )
+    worker["received"][first:last] = worker["blocks"][block] @ worker["ranks"]
 
-    # Update the pairs with the probability of choosing each value
-    for i in false_pagerank:
-        val = false_pagerank.get(i)
-        true_val = val / (n + 1)
-        pagerank.update({i: true_val})
 
-    return pagerank
+def power_step(graph, damping_factor):
+    """
+    Return the power iteration step, which adds the residual to the ranks.
+    """
+    return lambda ranks, r: ranks + r
 
 
-def iterate_pagerank(corpus, damping_factor):
+def jacobi_step(graph, damping_factor):
     """
-    Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    Return the Jacobi step, which solves each page's equation for its
+    own rank given the others', including its links to itself.
+    """
+    n = len(graph)
+    diagonal = damping_factor * (graph.transition_matrix().diagonal() + graph.dangling / n)
+    return lambda ranks, r: ranks + r / (1 - diagonal)
 
-    Return a dictionary where keys are page names, and values are
-    their estimated PageRank value (a value between 0 and 1). All
-    PageRank values should sum to 1.
+
+def gauss_seidel_step(graph, damping_factor):
+    """
+    Return the Gauss-Seidel step, which solves the page equations in
+    order with a sparse triangular solve. The dangling pages' share is
+    taken from the ranks before the sweep, so the ranks are rescaled to
+    sum to 1 afterwards, as the exact solution does.
     """
-    # Store pairs in a dict
-    rankings = dict()
+    n = len(graph)
+    matrix = graph.transition_matrix()
+    lower = (sparse.identity(n, format="csr") - damping_factor * sparse.tril(matrix)).tocsr()
+    upper = damping_factor * sparse.triu(matrix, 1).tocsr()
 
-    # Acceptable deviation / 10
-    limit = 0.0001
+    def step(ranks, r):
+        rhs = upper @ ranks
+        rhs += (damping_factor * ranks[graph.dangling].sum() + 1 - damping_factor) / n
+        ranks = spsolve_triangular(lower, rhs, lower=True)
+        return ranks / ranks.sum()
 
-    d = damping_factor
-    n = len(corpus)
+    return step
 
-    # Set initial dict values equal to 1/n
-    for pair in corpus:
-        rankings[pair] = 1 / n
 
-    # Check for lack of values
-    for key, value in corpus.items():
+def aitken(before, previous, ranks):
+    """
+    Return the Aitken delta-squared extrapolation of three consecutive
+    iterates, keeping `ranks` where the extrapolation is undefined or
+    would make a rank negative.
+    """
+    second = ranks - 2 * previous + before
+    safe = np.abs(second) > 1e-15
+    extrapolated = ranks.copy()
+    extrapolated[safe] = ranks[safe] - (ranks[safe] - previous[safe]) ** 2 / second[safe]
+    negative = extrapolated < 0
+    extrapolated[negative] = ranks[negative]
+    return extrapolated / extrapolated.sum()
 
-        if len(value) == 0:
-            # If no value is found, every page in the corpus (including this one) is added as a value
 
-            for i in corpus:
-                corpus[key].add(i)
+SOLVERS = {
+    "power": power_step,
+    "jacobi": jacobi_step,
+    "gauss-seidel": gauss_seidel_step,
+    "aitken": power_step
+}
 
-    # Iterate until it breaks
-    while True:
 
-        # Initialize a counter
-        count = 0
+class IncrementalPageRank():
+    """
+    PageRank values of a corpus that changes over time.
+
+    The first ranks are computed in full; after that, `update` applies
+    a change to the link graph in place and warm-starts from the
+    previous ranks, pushing the remaining error (residual) out of the
+    pages it affects. The ranks and residual are kept as arrays indexed
+    by page number, and only the rows of pages whose links changed are
+    rebuilt, so a small change costs far less than solving again.
+    """
 
-        # Loop over corpus' elements - 1st
-        for pair in corpus:
-            new = (1 - d) / n
-            summing = 0
+    def __init__(self, corpus, damping_factor, tolerance=TOLERANCE):
+        self.damping_factor = damping_factor
+        self.tolerance = tolerance
+        self.graph = LinkGraph.from_corpus(corpus)
+        self.ids = {page: i for i, page in enumerate(self.graph.pages)}
+        self.values = solve_pagerank(self.graph, damping_factor, tolerance=tolerance)[0]
+        self.residual = residual(self.graph, damping_factor, self.values)
+
+    def ranks(self):
+        """
+        Return a dictionary mapping each page to its current PageRank value.
+        """
+        return self.graph.ranks(self.values / self.values.sum())
+
+    def update(self, added_pages=(), removed_pages=(), added_links=(), removed_links=()):
+        """
+        Update the corpus and its PageRank values.
+
+        Pages are given by name, links as `(source, target)` pairs. Pages
+        named by an added link are added if needed, and removing a page
+        also removes every link to it. New pages start with no rank.
+        """
+        graph = self.graph
+        d = self.damping_factor
+        n = len(graph)
+        pages = list(graph.pages)
+
+        # New links of each page whose links change, as page numbers
+        rows = dict()
+
+        def row(page):
+            if page not in rows:
+                rows[page] = set(graph.indices[graph.indptr[page]:graph.indptr[page + 1]].tolist()) if page < n else set()
+            return rows[page]
+
+        def number(page):
+            if page not in self.ids:
+                self.ids[page] = len(pages)
+                pages.append(page)
+            return self.ids[page]
+
+        removed = [self.ids.pop(page) for page in set(removed_pages) if page in self.ids]
+        if removed:
+            # Pages linking to removed pages lose those links
+            positions = np.flatnonzero(np.isin(graph.indices, removed))
+            for source in set((np.searchsorted(graph.indptr, positions, side="right") - 1).tolist()):
+                row(source).difference_update(removed)
+            for page in removed:
+                rows[page] = set()
+        for page in added_pages:
+            number(page)
+        for source, target in removed_links:
+            if source in self.ids and target in self.ids:
+                row(self.ids[source]).discard(self.ids[target])
+        for source, target in added_links:
+            source, target = number(source), number(target)
+            if source != target:
+                row(source).add(target)
+
+        m = len(pages)
+        alive = np.ones(m, dtype=bool)
+        alive[removed] = False
+        values = np.zeros(m)
+        values[:n] = self.values
+        r = np.zeros(m)
+        r[:n] = self.residual
+
+        # Move the rank passed along each changed page's links
+        dangling = values[:n][graph.dangling].sum()
+        before = d * dangling / n + (1 - d) / n
+        for page, links in rows.items():
+            if page < n:
+                old = graph.indices[graph.indptr[page]:graph.indptr[page + 1]]
+                if len(old):
+                    r[old] -= d * values[page] / len(old)
+                else:
+                    dangling -= values[page]
+            if not alive[page]:
+                continue
+            if links:
+                r[list(links)] += d * values[page] / len(links)
+            else:
+                dangling += values[page]
+
+        # Every page receives the teleport and dangling share, which depend on n
+        size = m - len(removed)
+        r[:n] -= before
+        r += d * dangling / size + (1 - d) / size
+
+        self.graph = splice(graph, pages, rows, alive if removed else None)
+        if removed:
+            self.ids = dict(zip(self.graph.pages, range(size)))
+            values, r = values[alive], r[alive]
+
+        # Removed rank lowers every page's share alike; scaling the ranks
+        # by c scales the residual by c, plus the teleport share it misses
+        c = 1 / values.sum()
+        values *= c
+        r *= c
+        r += (1 - c) * (1 - d) / size
+        self.values, self.residual = values, r
+        push(self.graph, d, self.values, self.residual, self.tolerance)
+
+
+def splice(graph, pages, rows, alive=None):
+    """
+    Return a `LinkGraph` like `graph`, with pages numbered as in `pages`
+    (which extends `graph.pages`) and the links of each page in `rows`
+    replaced by the given set of page numbers. The rows in between are
+    copied as whole slices. If `alive` is given, the pages where it is
+    False are dropped and the rest renumbered in order; no row may link
+    to a dropped page.
+    """
+    n = len(graph)
+    degree = np.zeros(len(pages), dtype=np.int64)
+    degree[:n] = graph.out_degree
+
+    pieces = []
+    copied = 0
+    for page in sorted(rows):
+        start = graph.indptr[min(page, n)]
+        pieces.append(graph.indices[copied:start])
+        copied = graph.indptr[page + 1] if page < n else start
+        pieces.append(np.array(sorted(rows[page]), dtype=np.int32))
+        degree[page] = len(rows[page])
+    pieces.append(graph.indices[copied:])
+    indices = np.concatenate(pieces)
+
+    if alive is not None:
+        numbers = (np.cumsum(alive) - 1).astype(np.int32)
+        indices = numbers[indices]
+        degree = degree[alive]
+        pages = [page for page, keep in zip(pages, alive.tolist()) if keep]
+
+    return LinkGraph(pages, np.concatenate(([0], np.cumsum(degree))), indices)
+
+
+def residual(graph, damping_factor, ranks):
+    """
+    Return how far each page's rank is from satisfying the PageRank
+    equation given the ranks of the pages linking to it.
+    """
+    n = len(graph)
+    expected = graph.transition_matrix() @ ranks
+    expected += ranks[graph.dangling].sum() / n
+    expected *= damping_factor
+    expected += (1 - damping_factor) / n
+    return expected - ranks
 
-            # Loop over corpus' elements - 2nd
-            for page in corpus:
 
-                # Check if the pair is linked to by the corpus[page]
-                if pair in corpus[page]:
+def push_pagerank(graph, damping_factor, ranks, tolerance=TOLERANCE, max_rounds=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of a `LinkGraph`, refined from an initial
+    guess `ranks` until the L1 residual is below `tolerance`.
+
+    In each round, every page whose residual exceeds `tolerance / n`
+    absorbs it into its rank and passes `damping_factor` times it along
+    its links (a vectorized form of Gauss-Southwell pushing). Only those
+    pages and their links are touched, so after a small change to the
+    graph the work stays near the pages it affected. Rank pushed out of
+    dangling pages spreads to every page, so it is collected and added
+    to all residuals at once. When too many pages are off, a full power
+    step is taken instead.
+    """
+    ranks = ranks.copy()
+    push(graph, damping_factor, ranks, residual(graph, damping_factor, ranks), tolerance, max_rounds)
+    return ranks / ranks.sum()
 
-                    # If it is, add the probability of choosing pair, given that page is chosen
-                    num_links = len(corpus[page])
-                    summing += rankings[page] / num_links
 
-            # Update existing variables
-            summing *= d
-            new += summing
+def push(graph, damping_factor, ranks, r, tolerance=TOLERANCE, max_rounds=MAX_ITERATIONS):
+    """
+    Refine `ranks` in place by pushing, as described in `push_pagerank`,
+    given their residual `r`, which is kept up to date in place.
+    """
+    n = len(graph)
+    threshold = tolerance / n
+    spread = 0
+
+    for _ in range(max_rounds):
+        if abs(spread) > threshold:
+            r += spread
+            spread = 0
+        if np.abs(r).sum() + abs(spread) * n < tolerance:
+            break
+
+        active = np.flatnonzero(np.abs(r) > threshold)
+        if len(active) > n * PUSH_FRACTION:
+            ranks += r + spread
+            r[:] = residual(graph, damping_factor, ranks)
+            spread = 0
+            continue
 
-            # Check if the deviation is yet acceptable or not
-            if abs(rankings[pair] - new) < limit:
-                count += 1
+        pushed = r[active]
+        ranks[active] += pushed
+        r[active] = 0
 
-            # Update the dictionary with the latest rank (new) for the pair
-            rankings[pair] = new
+        dangling = graph.dangling[active]
+        spread += damping_factor * pushed[dangling].sum() / n
 
-        # Check if each and every key has a deviation of less than the limit
-        if count == n:
-            break  # If it does, break and return
+        # Spread the rest along the links out of the active pages
+        degree = graph.out_degree[active]
+        starts = graph.indptr[active]
+        ends = np.cumsum(degree)
+        positions = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - ends + degree, degree)
+        weights = np.repeat(damping_factor * pushed / np.maximum(degree, 1), degree)
+        np.add.at(r, graph.indices[positions], weights)
 
-    return rankings
+    r += spread
 
 
 if __name__ == "__main__":
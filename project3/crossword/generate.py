@@ -1,6 +1,7 @@
 import sys
 import operator
 import copy
+import collections
 
 from crossword import *
 
@@ -19,6 +20,9 @@ class CrosswordCreator():
             for var in self.crossword.variables
         }
 
+        # Words in each variable's domain by position and letter, built on first use
+        self.index = dict()
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -109,10 +113,41 @@ class CrosswordCreator():
         """
 
         for var in self.crossword.variables:
-            words = list(self.domains.get(var))
-            for w in words:
-                if var.length != len(w):
-                    self.domains[var].remove(w)
+            self.remove(var, [w for w in self.domains[var] if var.length != len(w)])
+
+    def letter_index(self, var):
+        """
+        Return the index of the words in `self.domains[var]`: a dictionary
+        mapping each position to a dictionary mapping each letter found
+        there to the set of words with that letter at that position.
+
+        The index is built from the domain the first time it is needed,
+        and `remove` keeps it up to date afterwards, dropping letters no
+        word has left, so the letters at a position are exactly the ones
+        the domain still supports there.
+        """
+        if var not in self.index:
+            positions = dict()
+            for word in self.domains[var]:
+                for position, letter in enumerate(word):
+                    positions.setdefault(position, dict()).setdefault(letter, set()).add(word)
+            self.index[var] = positions
+        return self.index[var]
+
+    def remove(self, var, words):
+        """
+        Remove `words` from the domain of `var`, and from its letter index.
+        """
+        self.domains[var].difference_update(words)
+        positions = self.index.get(var)
+        if positions is None:
+            return
+        for word in words:
+            for position, letter in enumerate(word):
+                candidates = positions[position][letter]
+                candidates.discard(word)
+                if not candidates:
+                    del positions[position][letter]
 
     def revise(self, x, y):
         """
@@ -125,42 +160,23 @@ class CrosswordCreator():
         """
 
         # Initialize useful variables
-        revised = False
-        rmv = []
         constraint = self.crossword.overlaps.get((x, y))
 
         # No possible routes for crossword combinations, unless the have distinct directions
         if x.direction == y.direction or constraint is None:
-            return revised
-
-        # Therefore, instead use these two lines
-        constraint_x = constraint[0]
-        constraint_y = constraint[1]
-
-        # Loop through possible domain values of x
-        for value in self.domains[x]:
-            found = False
+            return False
 
-            # Loop through possible domain values of y
-            for val in self.domains[y]:
+        # Letters y still supports at the overlap, and x's words by letter there
+        supported = self.letter_index(y).get(constraint[1], {})
+        candidates = self.letter_index(x).get(constraint[0], {})
 
-                # Check if found
-                if value[constraint_x] == val[constraint_y]:
-                    found = True
+        # Remove every word of x whose letter at the overlap y does not support
+        unsupported = [letter for letter in candidates if letter not in supported]
+        for letter in unsupported:
+            self.remove(x, list(candidates[letter]))
 
-            # If found move on to next one
-            if found:
-                continue
-            else:
-                rmv.append(value)
-                revised = True
-
-        # Remove all values in rmv list from domains of x
-        for not_match in rmv:
-            self.domains[x].remove(not_match)
-
-        # Returned boolean revised
-        return revised
+        # Return whether anything was removed
+        return len(unsupported) > 0
 
     def ac3(self, arcs=None):
         """
@@ -381,34 +397,236 @@ class CrosswordCreator():
         `assignment` is a mapping from variables (keys) to words (values).
 
         If no assignment is possible, return None.
+
+        The search works on bitset copies of `self.domains` (see
+        `load_bits`), maintaining arc consistency after every choice.
+        Each domain reduction is recorded on a trail, and undone from it
+        when a choice fails, so nothing is copied at each step.
         """
 
-    # Essentially, this function enforces a smarter instance of brute force
+        # Start from the current domains, narrowed by the partial assignment
+        self.load_bits()
+        if not self.propagate(self.arcs()):
+            return None
+        for var, word in assignment.items():
+            if not self.assign(var, word):
+                return None
 
-        if len(assignment.values()) == len(list(self.crossword.variables)):
-            return assignment
+        return self.search(dict(assignment))
 
-        # Call select_unassigned_variable and save it in var
-        var = self.select_unassigned_variable(assignment)
+    def search(self, assignment):
+        """
+        Extend `assignment` one variable at a time, in place, and return
+        it once complete; return None if it cannot be completed.
+        """
 
-        # Loop through domains of var
-        for domain in self.domains[var]:
-            new_assignment = assignment.copy()
-            new_assignment[var] = domain
+        if len(assignment) == len(self.crossword.variables):
+            return assignment
 
-            # Check for full consistency
-            if self.consistent(new_assignment):
+        # Fewest remaining words first, then most neighbors
+        var = min(
+            (v for v in self.crossword.variables if v not in assignment),
+            key=lambda v: (self.bits[v].bit_count(), -len(self.neighbors[v]))
+        )
 
-                # Recursively call same function and save in result
-                result = self.backtrack(new_assignment)
+        for word in self.ordered_words(var, assignment):
 
-                # Return result if not None
-                if result:
+            # Try the word, and undo every reduction it caused if it fails
+            mark = len(self.trail)
+            assignment[var] = word
+            if self.assign(var, word):
+                result = self.search(assignment)
+                if result is not None:
                     return result
+            del assignment[var]
+            self.undo(mark)
 
         # No possible assignment
         return None
 
+    def load_bits(self):
+        """
+        Represent each domain in `self.domains` as a bitset over the
+        dictionary's words of the variable's length.
+
+        Words of each length are numbered in sorted order in `self.buckets`,
+        and `self.masks` maps each length, position and letter to the
+        bitset of words with that letter there. `self.bits` holds each
+        variable's domain, and `self.trail` the changes made to it, as
+        `(variable, old bits)` pairs.
+        """
+        lengths = {var.length for var in self.crossword.variables}
+        buckets = {length: [] for length in lengths}
+        for word in sorted(self.crossword.words):
+            if len(word) in buckets:
+                buckets[len(word)].append(word)
+
+        self.buckets = buckets
+        self.numbers = {
+            length: {word: n for n, word in enumerate(words)}
+            for length, words in buckets.items()
+        }
+
+        self.masks = dict()
+        for length, words in buckets.items():
+            self.masks[length] = []
+            for position in range(length):
+                letters = dict()
+                for n, word in enumerate(words):
+                    letters.setdefault(word[position], []).append(n)
+                self.masks[length].append({
+                    letter: to_bits(numbers, len(words))
+                    for letter, numbers in letters.items()
+                })
+
+        self.bits = {
+            var: to_bits(
+                [self.numbers[var.length][word] for word in self.domains[var] if len(word) == var.length],
+                len(buckets[var.length])
+            )
+            for var in self.crossword.variables
+        }
+        self.trail = []
+
+        self.neighbors = {var: self.crossword.neighbors(var) for var in self.crossword.variables}
+        self.same_length = {
+            var: [other for other in self.crossword.variables if other != var and other.length == var.length]
+            for var in self.crossword.variables
+        }
+
+    def arcs(self):
+        """
+        Return every arc `(x, y)` between neighboring variables.
+        """
+        return [(x, y) for x in self.crossword.variables for y in self.neighbors[x]]
+
+    def narrow(self, var, bits):
+        """
+        Set the domain of `var` to `bits`, recording its old domain on the trail.
+        """
+        if bits != self.bits[var]:
+            self.trail.append((var, self.bits[var]))
+            self.bits[var] = bits
+
+    def undo(self, mark):
+        """
+        Restore every domain changed since the trail was `mark` entries long.
+        """
+        while len(self.trail) > mark:
+            var, bits = self.trail.pop()
+            self.bits[var] = bits
+
+    def assign(self, var, word):
+        """
+        Narrow the domain of `var` to `word`, remove `word` from every other
+        variable's domain (words are used once), and restore arc consistency.
+
+        Return False if some domain ends up empty.
+        """
+        number = self.numbers[var.length].get(word)
+        if number is None or not self.bits[var] >> number & 1:
+            return False
+        self.narrow(var, 1 << number)
+
+        arcs = [(neighbor, var) for neighbor in self.neighbors[var]]
+        for other in self.same_length[var]:
+            if self.bits[other] >> number & 1:
+                self.narrow(other, self.bits[other] & ~(1 << number))
+                if not self.bits[other]:
+                    return False
+                arcs.extend((neighbor, other) for neighbor in self.neighbors[other])
+
+        return self.propagate(arcs)
+
+    def revise_bits(self, x, y):
+        """
+        Return the bitset domain of `x` without the words for which no word
+        left for `y` has the same letter where they overlap.
+        """
+        i, j = self.crossword.overlaps[x, y]
+        supported = 0
+        for letter, words in self.masks[y.length][j].items():
+            if self.bits[y] & words:
+                supported |= self.masks[x.length][i].get(letter, 0)
+        return self.bits[x] & supported
+
+    def propagate(self, arcs):
+        """
+        Revise the bitset domains along `arcs`, and along the arcs into
+        every variable whose domain shrinks, until all are arc consistent.
+
+        Return False if a domain ends up empty.
+        """
+        queue = collections.deque(arcs)
+        queued = set(queue)
+        while queue:
+            arc = queue.popleft()
+            queued.discard(arc)
+            x, y = arc
+
+            bits = self.revise_bits(x, y)
+            if bits == self.bits[x]:
+                continue
+            if not bits:
+                return False
+            self.narrow(x, bits)
+
+            # Neighbors of x may have lost their support in it
+            for z in self.neighbors[x]:
+                if z != y and (z, x) not in queued:
+                    queue.append((z, x))
+                    queued.add((z, x))
+
+        return True
+
+    def ordered_words(self, var, assignment):
+        """
+        Return the words left for `var`, in order by how many words they
+        leave for unassigned neighbors, most first.
+        """
+        words = self.buckets[var.length]
+        candidates = [words[n] for n in bit_numbers(self.bits[var])]
+
+        # How many words each letter at the overlap leaves each neighbor
+        supports = []
+        for neighbor in self.neighbors[var]:
+            if neighbor in assignment:
+                continue
+            i, j = self.crossword.overlaps[var, neighbor]
+            counts = {
+                letter: (self.bits[neighbor] & mask).bit_count()
+                for letter, mask in self.masks[neighbor.length][j].items()
+            }
+            supports.append((i, counts))
+
+        return sorted(
+            candidates,
+            key=lambda word: -sum(counts.get(word[i], 0) for i, counts in supports)
+        )
+
+
+def to_bits(numbers, size):
+    """
+    Return the bitset, as an integer, with the bits at `numbers` set,
+    out of `size` bits.
+    """
+    array = bytearray((size + 7) // 8)
+    for n in numbers:
+        array[n >> 3] |= 1 << (n & 7)
+    return int.from_bytes(array, "little")
+
+
+def bit_numbers(bits):
+    """
+    Return the positions of the set bits in `bits`, in ascending order.
+    """
+    array = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    return [
+        (byte << 3) + k
+        for byte, value in enumerate(array) if value
+        for k in range(8) if value >> k & 1
+    ]
+
 
 def main():
 